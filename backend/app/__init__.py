@@ -1,3 +1,4 @@
+import logging
 from flask import Flask
 from flask_cors import CORS
 from config import config
@@ -8,9 +9,57 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # No-op when the server (e.g. gunicorn) already configured logging
+    logging.basicConfig(
+        level=app.config['LOG_LEVEL'],
+        format='%(asctime)s %(levelname)s [%(name)s] %(message)s'
+    )
+    # httpx logs every Supabase call at INFO; app.metrics already counts them
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    
+    from app.json_provider import init_json
+    init_json(app)
+    
+    # Registered first so that it runs after the other after_request hooks
+    from app.compression import init_compression
+    init_compression(app)
+    
     # Initialize extensions
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
+    from app.supabase_client import init_supabase
+    init_supabase(app)
+    
+    from app.jwt_verifier import init_token_verifier
+    init_token_verifier(app)
+    
+    from app.auth import init_auth
+    init_auth(app)
+    
+    from app.cache import init_cache, get_response_cache
+    init_cache(app)
+    
+    from app.chat_log import init_chat_log
+    init_chat_log(app)
+    
+    from app.price_index import init_price_index
+    init_price_index(app)
+    
+    from app.availability import init_availability
+    init_availability(app)
+    
+    from app.stream import init_stream
+    init_stream(app)
+    
+    from app.images import init_image_storage
+    init_image_storage(app)
+    
+    from app.metrics import init_metrics
+    init_metrics(app)
+    
+    from app.profiling import init_profiling
+    init_profiling(app)
+    
     # Register blueprints
     from app.routes import register_blueprints
     register_blueprints(app)
@@ -24,6 +73,13 @@ def create_app(config_name='default'):
     def internal_error(error):
         return {'error': 'Internal server error'}, 500
     
+    @app.route('/cache/stats')
+    def cache_stats():
+        cache = get_response_cache()
+        if cache is None:
+            return {'enabled': False}
+        return {'enabled': True, **cache.stats()}
+    
     @app.route('/')
     def index():
         return {
@@ -33,6 +89,7 @@ def create_app(config_name='default'):
             'endpoints': {
                 'auth': '/api/auth',
                 'products': '/api/products',
+                'orders': '/api/orders',
                 'chatbot': '/api/chatbot'
             }
         }
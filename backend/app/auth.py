@@ -0,0 +1,163 @@
+"""
+Shared authentication layer for the API routes.
+
+The bearer token is resolved once per request and the caller's ``users`` row
+is loaded at most once per request (memoized on ``flask.g``), backed by a
+short-lived cross-request cache keyed by user id.
+"""
+from functools import wraps
+from flask import current_app, g, jsonify, request
+from app.cache import TTLCache
+from app.concurrency import fan_out
+from app.supabase_client import get_supabase, verify_token
+
+
+def init_auth(app):
+    """Create the profile cache for ``app`` from its configuration."""
+    app.extensions['profile_cache'] = TTLCache(
+        maxsize=app.config.get('PROFILE_CACHE_SIZE', 2048),
+        ttl=app.config.get('PROFILE_CACHE_TTL', 60)
+    )
+
+
+def _profile_cache() -> TTLCache:
+    return current_app.extensions['profile_cache']
+
+
+def _get_bearer_token():
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None
+    # Extract token from "Bearer <token>"
+    return auth_header.split(' ')[1] if ' ' in auth_header else auth_header
+
+
+def _verify_request_token():
+    """Verify the request token without touching ``g`` (safe to run concurrently)."""
+    token = _get_bearer_token()
+    if not token:
+        return None, 'No authorization header'
+    try:
+        return verify_token(token), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _store_auth(user, error):
+    g._auth_resolved = True
+    g.current_user = user
+    g.auth_error = error
+
+
+def _resolve_user():
+    """Verify the request token once and memoize the outcome on ``g``."""
+    if '_auth_resolved' not in g:
+        _store_auth(*_verify_request_token())
+
+    return g.current_user
+
+
+def _run_prefetch(prefetch, args, kwargs):
+    # Errors are kept for get_prefetched() so the view handles them like its own
+    try:
+        return prefetch(*args, **kwargs), None
+    except Exception as e:
+        return None, e
+
+
+def require_auth(f=None, *, prefetch=None):
+    """
+    Decorator to require authentication for an endpoint.
+
+    ``prefetch`` is an optional lookup that does not depend on the caller
+    (e.g. the product whose owner the view checks), called with the view
+    arguments and read back with ``get_prefetched()``. When tokens are
+    verified remotely (AUTH_VERIFY_MODE=remote) it runs concurrently with
+    the verification.
+    """
+    if f is None:
+        return lambda view: require_auth(view, prefetch=prefetch)
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        concurrent = (
+            prefetch is not None
+            and '_auth_resolved' not in g
+            and current_app.config.get('AUTH_VERIFY_MODE') == 'remote'
+        )
+        if concurrent:
+            auth, g._prefetched = fan_out(
+                _verify_request_token,
+                lambda: _run_prefetch(prefetch, args, kwargs)
+            )
+            _store_auth(*auth)
+
+        user = _resolve_user()
+        if user is None:
+            return jsonify({'error': g.auth_error}), 401
+
+        if prefetch is not None and not concurrent:
+            g._prefetched = _run_prefetch(prefetch, args, kwargs)
+
+        request.current_user = user
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def get_prefetched():
+    """
+    Get the result of the ``prefetch`` lookup of ``require_auth``.
+
+    Raises:
+        Exception: The error raised by the lookup
+    """
+    result, error = g._prefetched
+    if error is not None:
+        raise error
+    return result
+
+
+def optional_auth():
+    """Try to get user from auth header, but don't require it."""
+    return _resolve_user()
+
+
+def get_current_profile():
+    """
+    Get the authenticated user's row from the ``users`` table.
+
+    Returns:
+        dict: The profile (shared with the cache, do not mutate), or None
+    """
+    if 'current_profile' in g:
+        return g.current_profile
+
+    user = _resolve_user()
+    if user is None:
+        return None
+
+    cache = _profile_cache()
+    profile = cache.get(user.id)
+    if profile is None:
+        result = get_supabase().table('users').select('*').eq('id', user.id).execute()
+        profile = result.data[0] if result.data else None
+        if profile is not None:
+            cache.set(user.id, profile)
+
+    g.current_profile = profile
+    return profile
+
+
+def cache_profile(profile: dict):
+    """Replace the cached profile after the row was updated."""
+    _profile_cache().set(profile['id'], profile)
+    if g.get('current_user') is not None and g.current_user.id == profile['id']:
+        g.current_profile = profile
+
+
+def invalidate_profile(user_id):
+    """Drop a cached profile so the next lookup reloads it."""
+    _profile_cache().pop(user_id)
+    if g.get('current_user') is not None and g.current_user.id == user_id:
+        g.pop('current_profile', None)
@@ -0,0 +1,87 @@
+"""
+Availability snapshot of in-stock products per crop.
+
+One aggregate query (the ``product_availability`` function shipped in
+supabase_schema.sql) is folded into offer count, total kilograms and min/max
+price per normalized crop, so the chatbot can answer stock questions without
+touching the database. The snapshot is rebuilt after ``ttl`` seconds or as
+soon as a product write invalidates it.
+"""
+import threading
+import time
+
+from flask import current_app
+
+from app.price_index import crop_key
+from app.supabase_client import get_supabase
+
+
+class AvailabilitySnapshot:
+    """Per-crop offer count, total kg and price range of in-stock products."""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._crops = {}
+        self._expires_at = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _build(self):
+        rows = get_supabase().rpc('product_availability', {}).execute().data or []
+
+        crops = {}
+        for row in rows:
+            key = crop_key(row['name'])
+            summary = crops.get(key)
+            if summary is None:
+                crops[key] = {
+                    'offers': row['offers'],
+                    'total_kg': row['total_kg'],
+                    'min_price': row['min_price'],
+                    'max_price': row['max_price']
+                }
+            else:
+                summary['offers'] += row['offers']
+                summary['total_kg'] += row['total_kg']
+                summary['min_price'] = min(summary['min_price'], row['min_price'])
+                summary['max_price'] = max(summary['max_price'], row['max_price'])
+        return crops
+
+    def get(self, crop: str):
+        """
+        Get the availability summary of a crop.
+
+        Returns:
+            dict: offers, total_kg, min_price and max_price, or None if out of stock
+        """
+        if time.monotonic() >= self._expires_at:
+            with self._lock:
+                if time.monotonic() >= self._expires_at:
+                    generation = self._generation
+                    self._crops = self._build()
+                    # A write during the build leaves the snapshot expired
+                    if generation == self._generation:
+                        self._expires_at = time.monotonic() + self.ttl
+        return self._crops.get(crop_key(crop))
+
+    def invalidate(self):
+        """Force a rebuild on the next lookup (after a product write)."""
+        self._generation += 1
+        self._expires_at = 0
+
+
+def init_availability(app):
+    """Create the availability snapshot for ``app`` from its configuration."""
+    app.extensions['availability'] = AvailabilitySnapshot(
+        ttl=app.config.get('AVAILABILITY_SNAPSHOT_TTL', 60)
+    )
+
+
+def get_availability() -> AvailabilitySnapshot:
+    """Get the availability snapshot of the current application."""
+    return current_app.extensions['availability']
+
+
+def invalidate_availability():
+    """Invalidate the availability snapshot of the current application."""
+    get_availability().invalidate()
@@ -0,0 +1,315 @@
+"""
+Caching helpers shared across the backend.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, request
+from werkzeug.http import parse_date
+
+try:
+    import redis
+except ImportError:  # Optional: only needed for CACHE_BACKEND=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    Expired entries are dropped lazily on access; once ``maxsize`` is reached
+    the least recently used entry is evicted.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key`` or ``default`` if missing/expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store ``value`` under ``key`` for ``ttl`` seconds (defaults to the cache TTL)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove ``key`` from the cache and return its value."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else default
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MemoryBackend:
+    """Cache backend storing entries in an in-process ``TTLCache``."""
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Counters must survive LRU eviction, so they live outside the TTLCache
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value, ttl):
+        self._entries.set(key, value, ttl)
+
+    def get_counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Cache backend for a Redis-compatible client.
+
+    Any object implementing ``get``, ``set(key, value, ex=...)`` and ``incr``
+    works, which lets tests pass a local stand-in instead of a Redis server.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, json.dumps(value), ex=ttl)
+
+    def get_counter(self, key):
+        raw = self.client.get(key)
+        return int(raw) if raw is not None else 0
+
+    def incr(self, key):
+        return int(self.client.incr(key))
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    """
+    Read-through cache of JSON responses grouped in namespaces.
+
+    Every namespace has a generation counter that is part of the cache key;
+    invalidating a namespace bumps the counter so all of its entries become
+    unreachable at once and age out of the backend.
+    """
+
+    def __init__(self, backend, ttl=30, prefix='farmon'):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _generation_key(self, namespace):
+        return f'{self.prefix}:gen:{namespace}'
+
+    def make_key(self, namespace, path, args):
+        """Build the key of a request from its path and normalized query args."""
+        normalized = urlencode(sorted(args.items(multi=True)))
+        digest = hashlib.sha1(f'{path}?{normalized}'.encode()).hexdigest()
+        generation = self.backend.get_counter(self._generation_key(namespace))
+        return f'{self.prefix}:{namespace}:{generation}:{digest}'
+
+    def get(self, namespace, key):
+        value = self.backend.get(key)
+        self._count(namespace, 'hits' if value is not None else 'misses')
+        return value
+
+    def set(self, namespace, key, value, ttl=None):
+        self.backend.set(key, value, self.ttl if ttl is None else ttl)
+
+    def invalidate(self, namespace):
+        """Drop every cached response of ``namespace``."""
+        self.backend.incr(self._generation_key(namespace))
+        self._count(namespace, 'invalidations')
+
+    def _count(self, namespace, counter):
+        with self._lock:
+            stats = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'invalidations': 0})
+            stats[counter] += 1
+
+    def stats(self):
+        """Hit/miss counters per namespace (counted by this process)."""
+        with self._lock:
+            namespaces = {name: dict(counters) for name, counters in self._stats.items()}
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': self.backend.size(),
+            'namespaces': namespaces
+        }
+
+
+def init_cache(app, backend=None):
+    """
+    Create the response cache for ``app``.
+
+    Args:
+        app: The Flask application
+        backend: Optional backend overriding CACHE_BACKEND (e.g. a test stand-in)
+    """
+    if backend is None:
+        backend_name = app.config.get('CACHE_BACKEND', 'memory')
+        if backend_name == 'none':
+            app.extensions['response_cache'] = None
+            return
+        if backend_name == 'redis':
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+            backend = RedisBackend(redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+        else:
+            backend = MemoryBackend(
+                maxsize=app.config.get('CACHE_MAX_ENTRIES', 1024),
+                ttl=app.config.get('CACHE_DEFAULT_TTL', 30)
+            )
+
+    app.extensions['response_cache'] = ResponseCache(
+        backend, ttl=app.config.get('CACHE_DEFAULT_TTL', 30)
+    )
+
+
+def get_response_cache():
+    """Get the response cache of the current application (None when disabled)."""
+    return current_app.extensions.get('response_cache')
+
+
+def invalidate_cache(*namespaces):
+    """Invalidate cached responses after a write; cache errors are only logged."""
+    cache = get_response_cache()
+    if cache is None:
+        return
+    for namespace in namespaces:
+        try:
+            cache.invalidate(namespace)
+        except Exception as e:
+            logger.warning('Failed to invalidate cache namespace %s: %s', namespace, e)
+
+
+def _set_validators(response):
+    """Give a successful response a strong ETag derived from its body."""
+    if response.get_etag()[0] is None:
+        response.set_etag(hashlib.sha256(response.get_data()).hexdigest()[:32])
+    # Clients may store the response but must revalidate it before reuse
+    response.cache_control.no_cache = True
+
+
+def make_conditional(response):
+    """
+    Add a strong ETag to a successful response and answer 304 when the
+    client's If-None-Match / If-Modified-Since shows it already has it.
+    """
+    if response.status_code == 200:
+        _set_validators(response)
+        response.make_conditional(request)
+    return response
+
+
+def _is_fresh(entry):
+    """Whether the client's validators match a cached entry."""
+    if request.if_none_match:
+        # Weak comparison (RFC 7232): compressed responses carry W/"<etag>"
+        return request.if_none_match.contains_weak(entry['etag'])
+    if request.if_modified_since and entry.get('last_modified'):
+        return parse_date(entry['last_modified']) <= request.if_modified_since
+    return False
+
+
+def cached_response(namespace, ttl=None):
+    """
+    Decorator caching successful JSON responses of a GET endpoint.
+
+    The key is built from the request path and its normalized query args.
+    Responses carry a strong ETag (and the view's Last-Modified, if any);
+    when a cached entry matches the client's validators a 304 is returned
+    without querying or re-serializing anything. Backend failures fall
+    through to the view so the cache never breaks a read.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None:
+                return make_conditional(current_app.make_response(f(*args, **kwargs)))
+
+            try:
+                key = cache.make_key(namespace, request.path, request.args)
+                entry = cache.get(namespace, key)
+            except Exception as e:
+                logger.warning('Response cache unavailable: %s', e)
+                return make_conditional(current_app.make_response(f(*args, **kwargs)))
+
+            if entry is not None:
+                if _is_fresh(entry):
+                    response = current_app.response_class(status=304)
+                else:
+                    response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+                response.set_etag(entry['etag'])
+                if entry.get('last_modified'):
+                    response.headers['Last-Modified'] = entry['last_modified']
+                response.cache_control.no_cache = True
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response)
+                try:
+                    cache.set(namespace, key, {
+                        'body': response.get_data(as_text=True),
+                        'mimetype': response.mimetype,
+                        'etag': response.get_etag()[0],
+                        'last_modified': response.headers.get('Last-Modified')
+                    }, ttl)
+                except Exception as e:
+                    logger.warning('Failed to store cached response: %s', e)
+                response.make_conditional(request)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return decorated_function
+    return decorator
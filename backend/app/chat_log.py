@@ -0,0 +1,143 @@
+"""
+Write-behind persistence of chatbot messages.
+
+Messages are queued on the request path and written by a background thread
+with one multi-row insert per batch, flushed when the batch is full or when
+the flush interval elapses. Remaining messages are drained on shutdown.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from flask import current_app
+
+from app.supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+
+def insert_chat_messages(messages: list):
+    """Insert a batch of chat_messages rows with a single request."""
+    get_supabase().table('chat_messages').insert(messages).execute()
+
+
+class ChatMessageWriter:
+    """Bounded queue of chat messages flushed in batches by a worker thread."""
+
+    def __init__(self, insert_batch=insert_chat_messages, batch_size=50,
+                 flush_interval=1.0, max_queue=10000):
+        self.insert_batch = insert_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, messages: list) -> bool:
+        """
+        Queue messages that must be written together (e.g. a user/bot pair).
+
+        Returns:
+            bool: False if the queue is full and the messages were dropped
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(messages)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(messages)
+            logger.warning('Chat message queue full, dropped %d messages', len(messages))
+            return False
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so each worker process starts its own
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._stop.clear()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='chat-log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._write(batch)
+
+    def _collect_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.extend(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            self.insert_batch(batch)
+            with self._lock:
+                self.written += len(batch)
+        except Exception:
+            with self._lock:
+                self.failed += len(batch)
+            logger.exception('Failed to save %d chat messages', len(batch))
+
+    def close(self, timeout=5.0):
+        """Stop the worker and write everything still queued."""
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+
+        batch = []
+        while True:
+            try:
+                batch.extend(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def stats(self):
+        """Queue depth and write counters of this process."""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'written': self.written,
+                'failed': self.failed,
+                'dropped': self.dropped
+            }
+
+
+def init_chat_log(app):
+    """Create the chat message writer for ``app`` and drain it at exit."""
+    writer = ChatMessageWriter(
+        batch_size=app.config.get('CHAT_LOG_BATCH_SIZE', 50),
+        flush_interval=app.config.get('CHAT_LOG_FLUSH_INTERVAL', 1.0),
+        max_queue=app.config.get('CHAT_LOG_MAX_QUEUE', 10000)
+    )
+    app.extensions['chat_log'] = writer
+    atexit.register(writer.close)
+
+
+def get_chat_log() -> ChatMessageWriter:
+    """Get the chat message writer of the current application."""
+    return current_app.extensions['chat_log']
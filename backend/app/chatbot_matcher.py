@@ -0,0 +1,124 @@
+"""
+Precompiled intent and crop matcher for the chatbot.
+
+All intent keywords and crop names (French and Kirundi) are compiled into a
+single regular expression over accent-folded text with word boundaries, built
+once at import time from a JSON lexicon. Crops can be added by editing the
+lexicon (or pointing CHATBOT_LEXICON_PATH at another file) without code changes.
+"""
+import json
+import os
+import re
+import unicodedata
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'data', 'chatbot_lexicon.json')
+
+_COMBINING_MARKS_RE = re.compile('[\u0300-\u036f]')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents, treat hyphens as spaces and collapse whitespace."""
+    folded = _COMBINING_MARKS_RE.sub('', unicodedata.normalize('NFKD', text.lower()))
+    return ' '.join(folded.replace('-', ' ').split())
+
+
+def _trie_pattern(terms) -> str:
+    """
+    Build a regex alternation factored by common prefixes.
+
+    ``re`` tries alternatives one by one, so sharing prefixes keeps the cost
+    per position close to constant as the lexicon grows.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # A complete term may also continue into a longer one
+            body = '(?:' + '|'.join(branches) + ')?'
+        return body
+
+    return build(trie)
+
+
+class ChatbotMatcher:
+    """
+    Find the intents and the crop mentioned in a message with one regex scan.
+
+    Crop names also match their plural (``haricots``, ``pommes de terre``).
+    Weak aliases (e.g. ``mais``, which is also the French "but") are only
+    used when no other crop is mentioned.
+    """
+
+    def __init__(self, lexicon: dict):
+        self._terms = {}
+        crops = lexicon.get('crops', [])
+
+        # Weak aliases first: once accents are folded they may collide with
+        # a crop name ("maïs" -> "mais") and must keep their weak meaning
+        for crop in crops:
+            for term in crop.get('weak_aliases', []):
+                self._add(term, ('weak_crop', crop['name']), plural=False)
+
+        for intent, keywords in lexicon.get('intents', {}).items():
+            for keyword in keywords:
+                self._add(keyword, ('intent', intent), plural=False)
+
+        for crop in crops:
+            for term in [crop['name']] + crop.get('aliases', []):
+                self._add(term, ('crop', crop['name']), plural=True)
+
+        self._pattern = re.compile(rf'(?<!\w)(?:{_trie_pattern(self._terms)})(?!\w)')
+
+    def _add(self, term, meaning, plural):
+        normalized = normalize_text(term)
+        self._terms.setdefault(normalized, meaning)
+        if plural:
+            # Pluralize the head word: "pomme de terre" -> "pommes de terre"
+            head, _, rest = normalized.partition(' ')
+            for suffix in ('s', 'x'):
+                plural_form = f'{head}{suffix} {rest}'.strip()
+                self._terms.setdefault(plural_form, meaning)
+
+    def match(self, message: str):
+        """
+        Analyse a message.
+
+        Returns:
+            tuple: The set of intents found and the first crop mentioned (or None)
+        """
+        intents = set()
+        crop = None
+        weak_crop = None
+
+        for found in self._pattern.finditer(normalize_text(message)):
+            kind, value = self._terms[found.group(0)]
+            if kind == 'intent':
+                intents.add(value)
+            elif kind == 'crop' and crop is None:
+                crop = value
+            elif kind == 'weak_crop' and weak_crop is None:
+                weak_crop = value
+
+        return intents, crop or weak_crop
+
+    def find_crop(self, text: str):
+        """Return the crop mentioned in ``text`` (e.g. a product name) or None."""
+        return self.match(text)[1]
+
+
+def load_matcher(path: str = DEFAULT_LEXICON_PATH) -> ChatbotMatcher:
+    """Build a matcher from a JSON lexicon file."""
+    with open(path, encoding='utf-8') as f:
+        return ChatbotMatcher(json.load(f))
+
+
+matcher = load_matcher(os.getenv('CHATBOT_LEXICON_PATH', DEFAULT_LEXICON_PATH))
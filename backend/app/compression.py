@@ -0,0 +1,105 @@
+"""
+gzip/brotli compression of API responses, negotiated by Accept-Encoding.
+
+Brotli is offered when the optional ``brotli`` package is installed and
+preferred over gzip at equal quality values. Only complete (not streamed)
+responses of COMPRESSION_MIN_SIZE bytes or more with a text or JSON
+mimetype are compressed, so the SSE feed, exports and media files are left
+alone.
+
+A compressed body gets a weak version of its ETag (as nginx does): the
+cached response can still be revalidated with If-None-Match, while a strong
+validator is never shared by two different encodings. Bodies with an ETag
+(the cached GET endpoints) are compressed once per encoding and kept in a
+small in-process LRU.
+"""
+import gzip
+import logging
+
+from flask import current_app, request
+
+from app.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip is offered without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'
+})
+
+
+def compress(data: bytes, encoding, gzip_level=6, brotli_quality=4) -> bytes:
+    """Compress ``data`` with ``encoding`` ('br' or 'gzip')."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    # mtime=0 keeps the output (and so its cache entry) deterministic
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def available_encodings():
+    """Encodings offered to clients, in order of preference."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _choose_encoding():
+    encoding = request.accept_encodings.best_match(available_encodings())
+    # best_match also returns an encoding the client only accepts through '*'
+    return encoding if encoding in available_encodings() else None
+
+
+def _compress_response(response):
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    # Whatever the outcome, the body depends on Accept-Encoding
+    response.vary.add('Accept-Encoding')
+
+    config = current_app.config
+    data = response.get_data()
+    if len(data) < config.get('COMPRESSION_MIN_SIZE', 1024):
+        return response
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    cache = current_app.extensions.get('compression_cache')
+    key = (etag, len(data), encoding) if etag and cache is not None else None
+    compressed = cache.get(key) if key else None
+    if compressed is None:
+        compressed = compress(
+            data, encoding,
+            gzip_level=config.get('COMPRESSION_GZIP_LEVEL', 6),
+            brotli_quality=config.get('COMPRESSION_BROTLI_QUALITY', 4)
+        )
+        if key:
+            cache.set(key, compressed)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Compress the responses of ``app`` when COMPRESSION_ENABLED."""
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+
+    cache_size = app.config.get('COMPRESSION_CACHE_SIZE', 256)
+    if cache_size:
+        # Keyed on the ETag, which changes with the body: entries never go stale
+        app.extensions['compression_cache'] = TTLCache(maxsize=cache_size, ttl=3600)
+    app.after_request(_compress_response)
+    logger.debug('Response compression enabled (%s)', ', '.join(available_encodings()))
@@ -0,0 +1,85 @@
+"""
+Concurrent fan-out of independent lookups within a request.
+
+Under gevent workers (``gunicorn -k gevent``, which monkey-patches sockets)
+the calls run as greenlets; otherwise they run on a small thread pool owned
+by the worker process. Either way the request waits for the slowest call
+instead of the sum of all of them.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import copy_current_request_context, current_app, has_request_context
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def gevent_active() -> bool:
+    """True when sockets are cooperative (gevent monkey-patching is in effect)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    # Pool threads do not survive fork, so each worker process creates its own
+    if _executor is None or _executor_pid != os.getpid():
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('FANOUT_MAX_WORKERS', 8),
+                    thread_name_prefix='fan-out'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _in_context(call):
+    if has_request_context():
+        return copy_current_request_context(call)
+
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            return call()
+    return run
+
+
+def fan_out(*calls):
+    """
+    Run independent callables concurrently.
+
+    Each call runs in a copy of the current request context: it can use
+    ``request`` and ``current_app``, but values it stores on ``g`` are not
+    seen by the caller, so return them instead.
+
+    Returns:
+        list: The results, in the order of ``calls``
+
+    Raises:
+        Exception: The first exception raised by a call, once all have finished
+    """
+    if len(calls) < 2:
+        return [call() for call in calls]
+
+    wrapped = [_in_context(call) for call in calls]
+
+    if gevent_active():
+        import gevent
+        greenlets = [gevent.spawn(call) for call in wrapped]
+        gevent.joinall(greenlets)
+        return [greenlet.get() for greenlet in greenlets]
+
+    futures = [_get_executor().submit(call) for call in wrapped]
+    errors = [future.exception() for future in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+    return [future.result() for future in futures]
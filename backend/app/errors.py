@@ -0,0 +1,27 @@
+"""
+JSON error responses shared by the route handlers.
+"""
+import logging
+
+from flask import jsonify, request
+
+logger = logging.getLogger(__name__)
+
+
+def server_error(error, message=None, **extra):
+    """
+    Log an exception a view could not handle and build its JSON 500 response.
+
+    Args:
+        error: The exception
+        message: Summary sent as ``error``, with the exception as ``details``
+            (default: the exception itself is the ``error``)
+        **extra: More fields for the response body
+
+    Returns:
+        tuple: The response and its status
+    """
+    logger.error('Unhandled error in %s', request.endpoint, exc_info=error)
+    body = {'error': message, 'details': str(error)} if message else {'error': str(error)}
+    body.update(extra)
+    return jsonify(body), 500
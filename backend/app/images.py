@@ -0,0 +1,310 @@
+"""
+Product image ingestion: resized variants in content-addressed storage.
+
+An uploaded photo is read in chunks (bounded by IMAGE_MAX_UPLOAD_BYTES)
+while its SHA-256 is computed, then decoded and resized on a bounded pool of
+threads (Pillow releases the GIL while resampling and encoding) into one
+JPEG per IMAGE_WIDTHS width and a square WebP thumbnail. Variants are stored
+under ``products/<sha256>/`` with a manifest written last, so an image that
+was already ingested is not processed again.
+
+Storage is the Supabase ``product-images`` bucket, or a local directory
+(IMAGE_STORAGE_BACKEND=local) served at ``/media/`` for development.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, send_from_directory
+from PIL import Image, ImageOps, UnidentifiedImageError
+from storage3.utils import StorageException
+
+from app.concurrency import fan_out, gevent_active
+from app.supabase_client import get_supabase
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+READ_CHUNK_SIZE = 64 * 1024
+# Allowance for the boundaries and part headers around a multipart file
+MULTIPART_OVERHEAD = 16 * 1024
+# Content-addressed objects never change
+IMMUTABLE_MAX_AGE = 31536000
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+class ImageError(Exception):
+    """An upload that cannot be ingested; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class LocalImageStorage:
+    """Variants in a local directory (development and tests)."""
+
+    def __init__(self, root, base_url='/media'):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(root, exist_ok=True)
+
+    def read(self, path):
+        """The contents of ``path``, or None if it does not exist."""
+        try:
+            with open(os.path.join(self.root, path), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, path, data, content_type):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Write then rename, so a concurrent reader never sees half a file
+        tmp_path = f'{full_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, full_path)
+
+    def url(self, path):
+        return f'{self.base_url}/{path}'
+
+
+class SupabaseImageStorage:
+    """Variants in a public Supabase Storage bucket."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def _bucket(self):
+        return get_supabase().storage.from_(self.bucket)
+
+    def read(self, path):
+        """The contents of ``path``, or None if it does not exist."""
+        try:
+            return self._bucket().download(path)
+        except StorageException as e:
+            if e.args and isinstance(e.args[0], dict) and str(e.args[0].get('statusCode')) in ('400', '404'):
+                return None
+            raise
+
+    def write(self, path, data, content_type):
+        self._bucket().upload(path, data, {
+            'content-type': content_type,
+            'cache-control': str(IMMUTABLE_MAX_AGE),
+            'upsert': 'true'
+        })
+
+    def url(self, path):
+        return self._bucket().get_public_url(path).rstrip('?')
+
+
+def _too_large(max_bytes):
+    if max_bytes < 1024 * 1024:
+        size = f'{max_bytes / 1024:.0f} KB'
+    else:
+        size = f'{max_bytes / (1024 * 1024):.3g} MB'
+    return ImageError(f'Image must be at most {size}', status=413)
+
+
+def check_upload_size(content_length, max_bytes, multipart=False):
+    """
+    Reject an upload by its Content-Length, before any of the body is read.
+
+    A multipart body may exceed ``max_bytes`` by MULTIPART_OVERHEAD; it must
+    declare its length, since the form parser spools the whole body to disk.
+
+    Raises:
+        ImageError: If the body is (or may be) larger than allowed
+    """
+    if content_length is None:
+        if multipart:
+            raise ImageError('Multipart uploads must send a Content-Length', status=411)
+        return
+    if content_length > max_bytes + (MULTIPART_OVERHEAD if multipart else 0):
+        raise _too_large(max_bytes)
+
+
+def read_upload(stream, max_bytes):
+    """
+    Read an uploaded file in chunks, hashing it on the way.
+
+    Returns:
+        tuple: The file contents and their SHA-256 hex digest
+
+    Raises:
+        ImageError: If the file is empty or larger than ``max_bytes``
+    """
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        if buffer.tell() + len(chunk) > max_bytes:
+            raise _too_large(max_bytes)
+        digest.update(chunk)
+        buffer.write(chunk)
+    if not buffer.tell():
+        raise ImageError('Image file is empty')
+    return buffer.getvalue(), digest.hexdigest()
+
+
+def _flatten(image):
+    """Convert to RGB, compositing any transparency over white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def build_variants(data, widths, thumbnail_size, quality, max_pixels):
+    """
+    Decode ``data`` and encode its variants (runs on the image pool).
+
+    Widths larger than the original are capped to it, so small photos are
+    never upscaled.
+
+    Returns:
+        dict: ``widths`` ({width: JPEG bytes}), ``thumbnail`` (WebP bytes),
+        ``width`` and ``height`` of the (EXIF-rotated) original
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise ImageError(f"Image format must be one of: {', '.join(ALLOWED_FORMATS)}")
+            # Checked on the header, before anything is decoded
+            if image.width * image.height > max_pixels:
+                raise ImageError('Image dimensions are too large')
+            image = _flatten(ImageOps.exif_transpose(image))
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        raise ImageError('File is not a valid image')
+
+    encoded = {}
+    for width in sorted({min(w, image.width) for w in widths}):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize(
+            (width, height), Image.LANCZOS, reducing_gap=3.0
+        )
+        output = io.BytesIO()
+        resized.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+        encoded[width] = output.getvalue()
+
+    thumbnail = ImageOps.fit(image, (thumbnail_size, thumbnail_size), Image.LANCZOS)
+    output = io.BytesIO()
+    thumbnail.save(output, 'WEBP', quality=quality, method=4)
+
+    return {'widths': encoded, 'thumbnail': output.getvalue(), 'width': image.width, 'height': image.height}
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    # Pool threads do not survive fork, so each worker process creates its own
+    if _executor is None or _executor_pid != os.getpid():
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('IMAGE_WORKERS', 2),
+                    thread_name_prefix='images'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _run_in_pool(fn, *args):
+    # The pool also bounds how many images a worker decodes at once (memory)
+    if gevent_active():
+        # A native thread, so resizing does not block the other greenlets
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return _get_executor().submit(fn, *args).result()
+
+
+def image_urls(manifest, storage):
+    """
+    Build the ``srcset``-ready URL map of an ingested image.
+
+    Returns:
+        dict: ``src`` (default width), ``srcset``, ``widths`` ({width: url}),
+        ``thumbnail``, ``width``, ``height`` and ``hash``
+    """
+    widths = {int(w): storage.url(path) for w, path in manifest['widths'].items()}
+    default_width = current_app.config.get('IMAGE_DEFAULT_WIDTH', 640)
+    src_width = max((w for w in widths if w <= default_width), default=min(widths))
+    return {
+        'src': widths[src_width],
+        'srcset': ', '.join(f'{widths[w]} {w}w' for w in sorted(widths)),
+        'widths': {str(w): widths[w] for w in sorted(widths)},
+        'thumbnail': storage.url(manifest['thumbnail']),
+        'width': manifest['width'],
+        'height': manifest['height'],
+        'hash': manifest['hash']
+    }
+
+
+def ingest_image(data, digest):
+    """
+    Store the variants of an uploaded image, unless it was ingested before.
+
+    Returns:
+        dict: The URL map of image_urls()
+
+    Raises:
+        ImageError: If the file is not an acceptable image
+    """
+    config = current_app.config
+    storage = get_image_storage()
+    prefix = f'products/{digest}'
+    manifest_path = f'{prefix}/manifest.json'
+
+    stored = storage.read(manifest_path)
+    if stored is not None:
+        return image_urls(json.loads(stored), storage)
+
+    variants = _run_in_pool(
+        build_variants, data, config['IMAGE_WIDTHS'], config['IMAGE_THUMBNAIL_SIZE'],
+        config['IMAGE_QUALITY'], config['IMAGE_MAX_PIXELS']
+    )
+
+    manifest = {
+        'hash': digest,
+        'width': variants['width'],
+        'height': variants['height'],
+        'widths': {str(w): f'{prefix}/w{w}.jpg' for w in variants['widths']},
+        'thumbnail': f'{prefix}/thumb.webp'
+    }
+    uploads = [
+        lambda w=w, body=body: storage.write(manifest['widths'][str(w)], body, 'image/jpeg')
+        for w, body in variants['widths'].items()
+    ]
+    uploads.append(lambda: storage.write(manifest['thumbnail'], variants['thumbnail'], 'image/webp'))
+    fan_out(*uploads)
+
+    # Last: its presence means every variant is stored
+    storage.write(manifest_path, json.dumps(manifest).encode(), 'application/json')
+    return image_urls(manifest, storage)
+
+
+def init_image_storage(app):
+    """Create the image storage of ``app`` (and serve local files at ``/media/``)."""
+    if app.config.get('IMAGE_STORAGE_BACKEND', 'supabase') == 'local':
+        storage = LocalImageStorage(app.config['IMAGE_LOCAL_DIR'])
+
+        @app.route('/media/<path:filename>', endpoint='media')
+        def media(filename):
+            return send_from_directory(storage.root, filename, max_age=IMMUTABLE_MAX_AGE)
+    else:
+        storage = SupabaseImageStorage(app.config.get('IMAGE_BUCKET', 'product-images'))
+
+    app.extensions['image_storage'] = storage
+
+
+def get_image_storage():
+    """Get the image storage of the current app."""
+    return current_app.extensions['image_storage']
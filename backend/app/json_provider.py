@@ -0,0 +1,118 @@
+"""
+JSON serialization of API responses.
+
+FastJSONProvider replaces Flask's default provider (used by ``jsonify``,
+``request.get_json`` and dicts returned by views). It encodes with orjson
+when the package is installed and falls back to the stdlib ``json`` module
+otherwise, with the same output types either way:
+
+- ``Decimal`` (e.g. a ``DECIMAL(10,2)`` price) is a JSON number, not a string
+- ``datetime``/``date`` are ISO 8601 strings (Flask's default is an HTTP date)
+- NaN and infinities are ``null`` (stdlib json would write invalid JSON)
+- keys keep their order instead of being sorted, and non-ASCII text is sent
+  as UTF-8 rather than ``\\u`` escapes
+
+Responses are built from the encoded bytes directly, without an
+intermediate ``str``.
+"""
+import decimal
+import json
+import math
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: stdlib json is used without it
+    orjson = None
+
+
+def _default(o):
+    """Encode the types neither orjson nor json handle by themselves."""
+    if isinstance(o, decimal.Decimal):
+        # DECIMAL(10,2) values have at most 10 digits, which a float round-trips
+        return float(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    # UUIDs, dataclasses and Markup, as Flask's default provider does
+    return DefaultJSONProvider.default(o)
+
+
+def _finite(o):
+    """``o`` with NaN and infinities replaced by None, as orjson encodes them."""
+    if isinstance(o, float):
+        return o if math.isfinite(o) else None
+    if isinstance(o, dict):
+        return {k: _finite(v) for k, v in o.items()}
+    if isinstance(o, (list, tuple)):
+        return [_finite(v) for v in o]
+    if o is None or isinstance(o, (str, int)):
+        return o
+    return _finite(_default(o))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson-backed JSON provider with a stdlib fallback."""
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+
+    def __init__(self, app, use_orjson=True):
+        super().__init__(app)
+        self.use_orjson = use_orjson and orjson is not None
+
+    @property
+    def backend(self):
+        return 'orjson' if self.use_orjson else 'json'
+
+    def _pretty(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps_bytes(self, obj, pretty=False) -> bytes:
+        """Serialize ``obj`` to UTF-8 JSON."""
+        if self.use_orjson:
+            option = orjson.OPT_NON_STR_KEYS
+            if pretty:
+                option |= orjson.OPT_INDENT_2
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=self.default, option=option)
+        if pretty:
+            return self.dumps(obj, indent=2).encode()
+        return self.dumps(obj).encode()
+
+    def dumps(self, obj, **kwargs) -> str:
+        # orjson takes no json.dumps keyword arguments: only plain calls use it
+        if self.use_orjson and not kwargs:
+            return self.dumps_bytes(obj).decode()
+        if 'indent' not in kwargs:
+            # Compact, as orjson writes it
+            kwargs.setdefault('separators', (',', ':'))
+        if 'allow_nan' in kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return super().dumps(obj, allow_nan=False, **kwargs)
+        except ValueError as e:
+            if 'Out of range float' not in str(e):
+                raise
+            # Rare, so only then is the whole object walked
+            return super().dumps(_finite(obj), **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            # orjson.JSONDecodeError is a ValueError, as Flask expects
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.dumps_bytes(obj, pretty=self._pretty()) + b'\n', mimetype=self.mimetype
+        )
+
+
+def init_json(app):
+    """Install the JSON provider of ``app`` (JSON_USE_ORJSON=false forces stdlib json)."""
+    app.json = FastJSONProvider(app, use_orjson=app.config.get('JSON_USE_ORJSON', True))
@@ -0,0 +1,157 @@
+"""
+Local verification of Supabase access tokens.
+
+Tokens are validated in-process (signature, expiry, audience) using either the
+project's JWT secret (HS256) or the asymmetric signing keys published on the
+Supabase JWKS endpoint, so authenticated requests no longer need a round-trip
+to Supabase Auth.
+"""
+import hashlib
+import threading
+import time
+
+import httpx
+import jwt
+from flask import current_app
+
+from app.cache import TTLCache
+
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256', 'EdDSA')
+
+
+class TokenUser:
+    """
+    User built from verified JWT claims.
+
+    Exposes the same attributes the routes read from the gotrue ``User``
+    returned by ``supabase.auth.get_user``.
+    """
+
+    def __init__(self, claims: dict):
+        self.id = claims['sub']
+        self.email = claims.get('email')
+        self.phone = claims.get('phone')
+        self.role = claims.get('role')
+        self.app_metadata = claims.get('app_metadata', {})
+        self.user_metadata = claims.get('user_metadata', {})
+        self.claims = claims
+
+
+class JWKSCache:
+    """
+    Cached JSON Web Key Set.
+
+    The key set is refetched when it expires or when a token references an
+    unknown key id (key rotation), at most once per ``min_refresh_interval``.
+    """
+
+    def __init__(self, url: str, ttl: int = 600, min_refresh_interval: int = 30, timeout: float = 5.0):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid: str):
+        """Return the ``PyJWK`` for ``kid`` or None if the key set does not contain it."""
+        with self._lock:
+            now = time.monotonic()
+            if self._fetched_at is None or now - self._fetched_at >= self.ttl:
+                self._refresh()
+            elif kid not in self._keys and now - self._fetched_at >= self.min_refresh_interval:
+                self._refresh()
+            return self._keys.get(kid)
+
+    def _refresh(self):
+        response = httpx.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        jwk_set = jwt.PyJWKSet.from_dict(response.json())
+        self._keys = {key.key_id: key for key in jwk_set.keys}
+        self._fetched_at = time.monotonic()
+
+
+class TokenVerifier:
+    """Validate Supabase JWTs locally and cache the resulting users."""
+
+    def __init__(self, secret=None, jwks_url=None, audience='authenticated', issuer=None,
+                 leeway=30, cache_size=4096, cache_ttl=300, jwks_ttl=600):
+        self.secret = secret
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.cache_ttl = cache_ttl
+        self._jwks = JWKSCache(jwks_url, ttl=jwks_ttl) if jwks_url else None
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def verify(self, token: str) -> TokenUser:
+        """
+        Verify a token and return its user.
+
+        Raises:
+            jwt.InvalidTokenError: If the token is malformed, expired or badly signed
+        """
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        user = self._cache.get(cache_key)
+        if user is not None:
+            return user
+
+        claims = self._decode(token)
+        user = TokenUser(claims)
+
+        # Never keep a token in the cache past its own expiry
+        ttl = min(self.cache_ttl, claims['exp'] - time.time())
+        if ttl > 0:
+            self._cache.set(cache_key, user, ttl)
+        return user
+
+    def _decode(self, token: str) -> dict:
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get('alg')
+
+        if algorithm == 'HS256':
+            if not self.secret:
+                raise jwt.InvalidTokenError('HS256 tokens require SUPABASE_JWT_SECRET')
+            key = self.secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            if self._jwks is None:
+                raise jwt.InvalidTokenError('No JWKS endpoint configured')
+            jwk = self._jwks.get_key(header.get('kid'))
+            if jwk is None:
+                raise jwt.InvalidTokenError('Unknown signing key')
+            key = jwk.key
+        else:
+            raise jwt.InvalidTokenError(f'Unsupported algorithm: {algorithm}')
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            issuer=self.issuer,
+            leeway=self.leeway,
+            options={'require': ['exp', 'sub']}
+        )
+
+
+def init_token_verifier(app):
+    """Create the token verifier for ``app`` from its configuration."""
+    jwks_url = app.config.get('SUPABASE_JWKS_URL')
+    if not jwks_url and app.config.get('SUPABASE_URL'):
+        jwks_url = app.config['SUPABASE_URL'].rstrip('/') + '/auth/v1/.well-known/jwks.json'
+
+    app.extensions['token_verifier'] = TokenVerifier(
+        secret=app.config.get('SUPABASE_JWT_SECRET'),
+        jwks_url=jwks_url,
+        audience=app.config.get('SUPABASE_JWT_AUDIENCE'),
+        issuer=app.config.get('SUPABASE_JWT_ISSUER'),
+        cache_size=app.config.get('AUTH_TOKEN_CACHE_SIZE', 4096),
+        cache_ttl=app.config.get('AUTH_TOKEN_CACHE_TTL', 300),
+        jwks_ttl=app.config.get('AUTH_JWKS_CACHE_TTL', 600)
+    )
+
+
+def get_token_verifier() -> TokenVerifier:
+    """Get the token verifier of the current application."""
+    return current_app.extensions['token_verifier']
@@ -0,0 +1,220 @@
+"""
+Request and upstream (Supabase) metrics in the Prometheus text format.
+
+Every request records its latency, status and the in-flight count per
+endpoint. Every HTTP call to Supabase made through the pooled client records
+its latency per table (or RPC function), and the number of calls and the
+time spent upstream are added to the current request, reported in a
+``Server-Timing`` header and in a per-endpoint histogram, so handlers making
+many round-trips stand out.
+
+Values are kept per worker process; each worker reports its own series.
+"""
+import bisect
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+# Per-request upstream totals live in the WSGI environ so lookups running in
+# copied request contexts (app.concurrency.fan_out) add to the same request
+UPSTREAM_ENVIRON_KEY = 'farmon.upstream'
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter per label values."""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield self.name, label_values, (), value
+
+
+class Gauge(Counter):
+    """Value that goes up and down."""
+
+    type = 'gauge'
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label values."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(label_values, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[label_values] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {k: (list(counts), total) for k, (counts, total) in self._values.items()}
+        for label_values, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                yield f'{self.name}_bucket', label_values, (('le', le),), cumulative
+            yield f'{self.name}_sum', label_values, (), total
+            yield f'{self.name}_count', label_values, (), cumulative
+
+
+class Metrics:
+    """The metrics of one worker process."""
+
+    def __init__(self):
+        self.requests = Counter(
+            'farmon_http_requests_total', 'HTTP requests by endpoint and status',
+            ('method', 'endpoint', 'status'))
+        self.request_duration = Histogram(
+            'farmon_http_request_duration_seconds', 'HTTP request latency',
+            ('method', 'endpoint'))
+        self.in_flight = Gauge(
+            'farmon_http_requests_in_flight', 'HTTP requests being served')
+        self.request_upstream_calls = Histogram(
+            'farmon_http_request_upstream_calls', 'Supabase calls made per HTTP request',
+            ('method', 'endpoint'), buckets=CALL_COUNT_BUCKETS)
+        self.upstream_requests = Counter(
+            'farmon_upstream_requests_total', 'Supabase HTTP calls by table and status',
+            ('table', 'method', 'status'))
+        self.upstream_duration = Histogram(
+            'farmon_upstream_request_duration_seconds', 'Supabase HTTP call latency',
+            ('table', 'method'))
+
+    def all(self):
+        return (self.requests, self.request_duration, self.in_flight,
+                self.request_upstream_calls, self.upstream_requests, self.upstream_duration)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.all():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, label_values, extra, value in metric.samples():
+                lines.append(f'{name}{_format_labels(metric.labels, label_values, extra)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by every app of the process: upstream calls also happen outside
+# requests (e.g. the chat message writer thread)
+metrics = Metrics()
+
+
+def upstream_target(path: str) -> str:
+    """Name the table or RPC function a Supabase URL path refers to."""
+    parts = [p for p in path.split('/') if p]
+    if len(parts) >= 3 and parts[0] == 'rest':
+        return f'rpc:{parts[3]}' if parts[2] == 'rpc' and len(parts) > 3 else parts[2]
+    if parts and parts[0] == 'auth':
+        return 'auth'
+    return 'other'
+
+
+def record_upstream(method, path, status, duration):
+    """Record one Supabase HTTP call (status is 'error' when no response came back)."""
+    target = upstream_target(path)
+    metrics.upstream_requests.inc(target, method, str(status))
+    metrics.upstream_duration.observe(duration, target, method)
+
+    if has_request_context():
+        totals = request.environ.setdefault(UPSTREAM_ENVIRON_KEY, {'calls': 0, 'seconds': 0.0})
+        totals['calls'] += 1
+        totals['seconds'] += duration
+
+
+def _endpoint():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _before_request():
+    g._metrics_started = time.perf_counter()
+    metrics.in_flight.inc()
+
+
+def _after_request(response):
+    if '_metrics_started' not in g or request.endpoint == 'metrics':
+        return response
+
+    elapsed = time.perf_counter() - g._metrics_started
+    endpoint = _endpoint()
+    metrics.requests.inc(request.method, endpoint, str(response.status_code))
+    metrics.request_duration.observe(elapsed, request.method, endpoint)
+
+    totals = request.environ.get(UPSTREAM_ENVIRON_KEY, {'calls': 0, 'seconds': 0.0})
+    metrics.request_upstream_calls.observe(totals['calls'], request.method, endpoint)
+    response.headers.add(
+        'Server-Timing',
+        f'upstream;dur={totals["seconds"] * 1000:.1f};desc="{totals["calls"]} calls", '
+        f'app;dur={elapsed * 1000:.1f}'
+    )
+    g._metrics_recorded = True
+    return response
+
+
+def _teardown_request(error=None):
+    if '_metrics_started' not in g:
+        return
+    metrics.in_flight.dec()
+    if error is not None and not g.get('_metrics_recorded') and request.endpoint != 'metrics':
+        # The response never went through after_request
+        metrics.requests.inc(request.method, _endpoint(), '500')
+
+
+def init_metrics(app):
+    """Record request metrics for ``app`` and serve them at ``/metrics``."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    app.extensions['metrics'] = metrics
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.route('/metrics', endpoint='metrics')
+    def metrics_endpoint():
+        return current_app.response_class(
+            metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -0,0 +1,79 @@
+"""
+Keyset (cursor) pagination helpers for PostgREST queries.
+
+Pages are ordered by ``(<column>, id)`` and a cursor encodes the last row of
+the previous page, so fetching any page costs the same regardless of how deep
+into the table it is.
+"""
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(value, row_id) -> str:
+    """Build an opaque cursor pointing after the row ``(value, row_id)``."""
+    raw = json.dumps([value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _iso_timestamp(value):
+    datetime.fromisoformat(value)
+    return value  # Filtered on as the text PostgREST returned
+
+
+def decode_cursor(cursor: str, parse_value=_iso_timestamp):
+    """
+    Decode a cursor built by ``encode_cursor``.
+
+    ``parse_value`` validates the ordering value (an ISO timestamp by
+    default) and returns it in the form to filter on.
+
+    Returns:
+        tuple: The ``(value, id)`` the cursor points after
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        # Validate both parts before they are embedded in a filter
+        value = parse_value(value)
+        row_id = int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+    return value, row_id
+
+
+def apply_keyset(query, column: str, cursor: str = None, desc: bool = True):
+    """
+    Order ``query`` by ``(column, id)`` and skip to the row after ``cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    direction = 'desc' if desc else 'asc'
+    query.params = query.params.add('order', f'{column}.{direction},id.{direction}')
+
+    if cursor:
+        value, row_id = decode_cursor(cursor)
+        op = 'lt' if desc else 'gt'
+        query.params = query.params.add(
+            'or', f'({column}.{op}."{value}",and({column}.eq."{value}",id.{op}.{row_id}))'
+        )
+    return query
+
+
+def split_page(rows: list, limit: int, column: str):
+    """
+    Trim a result fetched with ``limit + 1`` rows into a page.
+
+    Returns:
+        tuple: The page rows and the cursor of the next page (None on the last page)
+    """
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[column], last['id'])
@@ -0,0 +1,139 @@
+"""
+Process-local index of the latest market price per (crop, market).
+
+The index is loaded on first use and then refreshed incrementally by polling
+only the market_prices rows recorded after the last one seen, so chatbot
+price answers are dictionary lookups instead of ``ilike`` scans.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from app.chatbot_matcher import matcher, normalize_text
+from app.pagination import apply_keyset, encode_cursor
+from app.supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+
+class StalePriceIndex(Exception):
+    """The index could not be refreshed within its staleness bound."""
+
+
+def crop_key(name: str) -> str:
+    """Key a crop name by the lexicon crop it mentions ("Haricots" -> "haricot")."""
+    return matcher.find_crop(name) or normalize_text(name)
+
+
+def _recorded_at(row):
+    return datetime.fromisoformat(row['date_recorded'])
+
+
+class LatestPriceIndex:
+    """
+    Latest price per normalized crop and market.
+
+    Refreshes happen inline when the data is older than ``refresh_interval``;
+    only one thread refreshes while the others keep reading the current data.
+    Lookups fail with ``StalePriceIndex`` once the last successful refresh is
+    older than ``max_staleness``.
+    """
+
+    def __init__(self, refresh_interval=60, max_staleness=600, page_size=1000):
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.page_size = page_size
+        self._prices = {}
+        self._cursor = None
+        self._refreshed_at = None
+        self._refresh_lock = threading.Lock()
+
+    def _fetch_page(self):
+        query = get_supabase().table('market_prices').select(
+            'id, crop_name, market_location, price, date_recorded'
+        )
+        query = apply_keyset(query, 'date_recorded', self._cursor, desc=False)
+        return query.limit(self.page_size).execute().data
+
+    def refresh(self):
+        """Fetch the rows recorded since the last refresh and merge them."""
+        while True:
+            rows = self._fetch_page()
+            # Copy-on-write per crop so readers never see a dict being mutated
+            updated = {}
+            for row in rows:
+                key = crop_key(row['crop_name'])
+                if key not in updated:
+                    updated[key] = dict(self._prices.get(key, {}))
+                markets = updated[key]
+                market = normalize_text(row['market_location'])
+                current = markets.get(market)
+                if current is None or (_recorded_at(row), row['id']) > (_recorded_at(current), current['id']):
+                    markets[market] = row
+            self._prices.update(updated)
+            if rows:
+                self._cursor = encode_cursor(rows[-1]['date_recorded'], rows[-1]['id'])
+            if len(rows) < self.page_size:
+                break
+        self._refreshed_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._refreshed_at is None:
+            # Nothing to serve yet: every caller waits for the first load
+            with self._refresh_lock:
+                if self._refreshed_at is None:
+                    self.refresh()
+            return
+
+        age = time.monotonic() - self._refreshed_at
+        if age < self.refresh_interval:
+            return
+
+        if self._refresh_lock.acquire(blocking=False):
+            try:
+                self.refresh()
+                return
+            except Exception as e:
+                logger.warning('Failed to refresh market price index: %s', e)
+            finally:
+                self._refresh_lock.release()
+
+        if time.monotonic() - self._refreshed_at > self.max_staleness:
+            raise StalePriceIndex('Market price index is older than its staleness bound')
+
+    def latest(self, crop: str):
+        """
+        Get the most recent price row of a crop across all markets.
+
+        Returns:
+            dict: The market_prices row, or None if the crop has no prices
+
+        Raises:
+            StalePriceIndex: If the index cannot be kept within its staleness bound
+        """
+        self._ensure_fresh()
+        markets = self._prices.get(crop_key(crop))
+        if not markets:
+            return None
+        return max(markets.values(), key=lambda row: (_recorded_at(row), row['id']))
+
+    def latest_by_market(self, crop: str) -> dict:
+        """Get the latest price row of a crop in every market."""
+        self._ensure_fresh()
+        return dict(self._prices.get(crop_key(crop), {}))
+
+
+def init_price_index(app):
+    """Create the latest-price index for ``app`` from its configuration."""
+    app.extensions['price_index'] = LatestPriceIndex(
+        refresh_interval=app.config.get('PRICE_INDEX_REFRESH_INTERVAL', 60),
+        max_staleness=app.config.get('PRICE_INDEX_MAX_STALENESS', 600)
+    )
+
+
+def get_price_index() -> LatestPriceIndex:
+    """Get the latest-price index of the current application."""
+    return current_app.extensions['price_index']
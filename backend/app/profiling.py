@@ -0,0 +1,200 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it is sampled (PROFILE_SAMPLE_RATE) or when an
+admin sends the ``X-Profile`` header. The profile is written to a bounded
+ring buffer of files in PROFILE_DIR, with a JSON summary next to it, and
+served by the admin routes. cProfile output (``.prof``) opens in snakeviz
+or converts to a flamegraph with flameprof; with PROFILER=pyinstrument
+(optional dependency) profiles are speedscope JSON flamegraphs.
+"""
+import cProfile
+import json
+import logging
+import marshal
+import os
+import random
+import threading
+import time
+import uuid
+
+from flask import current_app, g, request
+
+from app.auth import get_current_profile
+
+try:
+    import pyinstrument
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # Optional: only needed for PROFILER=pyinstrument
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+
+# Only one profiler can be attached per process at a time (sys.monitoring on
+# Python 3.12+), so concurrent requests are simply not profiled
+_active = threading.Lock()
+
+
+class ProfileStore:
+    """Ring buffer of profile files in one directory, shared by all workers."""
+
+    def __init__(self, directory, max_profiles=50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id, ext):
+        return os.path.join(self.directory, f'{profile_id}.{ext}')
+
+    def save(self, data: bytes, ext: str, summary: dict) -> str:
+        """Store a profile and its summary, dropping the oldest beyond ``max_profiles``."""
+        # Time-ordered ids keep the ring buffer ordering independent of mtime
+        profile_id = f'{time.time_ns():020d}-{uuid.uuid4().hex[:8]}'
+        with open(self._path(profile_id, ext), 'wb') as f:
+            f.write(data)
+        with open(self._path(profile_id, 'json'), 'w') as f:
+            json.dump({'id': profile_id, 'format': ext, **summary}, f)
+        self._trim()
+        return profile_id
+
+    def _ids(self):
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    def _trim(self):
+        ids = self._ids()
+        # Not ids[:-max_profiles], which keeps everything when max_profiles is 0
+        for profile_id in ids[:max(len(ids) - self.max_profiles, 0)]:
+            for name in os.listdir(self.directory):
+                if name.startswith(profile_id):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        pass  # Removed by another worker
+
+    def list(self) -> list:
+        """Summaries of the stored profiles, newest first."""
+        summaries = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(self._path(profile_id, 'json')) as f:
+                    summaries.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return summaries
+
+    def path(self, profile_id: str):
+        """
+        Get the file of a stored profile.
+
+        Returns:
+            tuple: The path and the format (``prof`` or ``speedscope.json``), or None
+        """
+        if '/' in profile_id or profile_id.startswith('.'):
+            return None
+        try:
+            with open(self._path(profile_id, 'json')) as f:
+                ext = json.load(f)['format']
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        return self._path(profile_id, ext), ext
+
+
+def _wants_profile():
+    if request.headers.get(PROFILE_HEADER):
+        profile = get_current_profile()
+        if profile and profile.get('role') == 'admin':
+            return 'header'
+    rate = current_app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    if rate > 0 and random.random() < rate:
+        return 'sampled'
+    return None
+
+
+def _start_profiler():
+    if current_app.config.get('PROFILER') == 'pyinstrument' and pyinstrument is not None:
+        profiler = pyinstrument.Profiler(async_mode='disabled')
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler):
+    """Stop ``profiler`` and serialize it: (bytes, file extension)."""
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profiler.create_stats()
+        # Same format as Profile.dump_stats(), readable by pstats/snakeviz
+        return marshal.dumps(profiler.stats), 'prof'
+
+    profiler.stop()
+    return profiler.output(SpeedscopeRenderer()).encode(), 'speedscope.json'
+
+
+def _before_request():
+    reason = _wants_profile()
+    if reason is None or not _active.acquire(blocking=False):
+        return
+    try:
+        g._profiler = _start_profiler()
+        g._profile_reason = reason
+        g._profile_started = time.perf_counter()
+    except Exception:
+        _active.release()
+        logger.exception('Failed to start profiler')
+
+
+def _after_request(response):
+    profiler = g.pop('_profiler', None)
+    if profiler is None:
+        return response
+
+    try:
+        duration = time.perf_counter() - g._profile_started
+        data, ext = _stop_profiler(profiler)
+        profile_id = current_app.extensions['profile_store'].save(data, ext, {
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'reason': g._profile_reason,
+            'pid': os.getpid(),
+            'recorded_at': time.time()
+        })
+        response.headers['X-Profile-Id'] = profile_id
+    except Exception:
+        logger.exception('Failed to save profile')
+    finally:
+        _active.release()
+    return response
+
+
+def _teardown_request(error=None):
+    # after_request did not run (unhandled error): detach the profiler
+    profiler = g.pop('_profiler', None)
+    if profiler is not None:
+        try:
+            _stop_profiler(profiler)
+        finally:
+            _active.release()
+
+
+def init_profiling(app):
+    """Profile sampled or admin-requested requests of ``app``."""
+    if not app.config.get('PROFILING_ENABLED', False):
+        return
+
+    if app.config.get('PROFILER') == 'pyinstrument' and pyinstrument is None:
+        logger.warning('PROFILER=pyinstrument but pyinstrument is not installed, using cProfile')
+
+    app.extensions['profile_store'] = ProfileStore(
+        app.config.get('PROFILE_DIR', '/tmp/farmon-profiles'),
+        max_profiles=app.config.get('PROFILE_MAX_FILES', 50)
+    )
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -3,7 +3,15 @@ def register_blueprints(app):
     from app.routes.auth import auth_bp
     from app.routes.marketplace import marketplace_bp
     from app.routes.chatbot import chatbot_bp
+    from app.routes.export import export_bp
+    from app.routes.orders import orders_bp
+    from app.routes.admin import admin_bp
+    from app.routes.stream import stream_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(marketplace_bp, url_prefix='/api')
     app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
+    app.register_blueprint(export_bp, url_prefix='/api/export')
+    app.register_blueprint(orders_bp, url_prefix='/api/orders')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(stream_bp, url_prefix='/api/stream')
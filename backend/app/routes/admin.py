@@ -0,0 +1,60 @@
+"""
+Admin routes (admin role only).
+"""
+import logging
+from functools import wraps
+from flask import Blueprint, current_app, jsonify, send_file
+from app.auth import require_auth, get_current_profile
+
+admin_bp = Blueprint('admin', __name__)
+logger = logging.getLogger(__name__)
+
+
+def admin_only(f):
+    """Restrict an authenticated endpoint to admins."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        profile = get_current_profile()
+        if not profile or profile.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    
+    return decorated_function
+
+
+def _profile_store():
+    return current_app.extensions.get('profile_store')
+
+
+@admin_bp.route('/profiles', methods=['GET'])
+@require_auth
+@admin_only
+def list_profiles():
+    """List the stored request profiles, newest first."""
+    store = _profile_store()
+    if store is None:
+        return jsonify({'error': 'Profiling is disabled (PROFILING_ENABLED)'}), 404
+    
+    profiles = store.list()
+    return jsonify({
+        'profiles': profiles,
+        'count': len(profiles)
+    }), 200
+
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+@require_auth
+@admin_only
+def get_profile(profile_id):
+    """Download a stored profile (.prof for cProfile, speedscope JSON for pyinstrument)."""
+    store = _profile_store()
+    found = store.path(profile_id) if store is not None else None
+    if found is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    path, ext = found
+    try:
+        return send_file(path, as_attachment=True, download_name=f'{profile_id}.{ext}')
+    except FileNotFoundError:
+        # Dropped from the ring buffer in the meantime
+        return jsonify({'error': 'Profile not found'}), 404
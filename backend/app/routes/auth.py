@@ -4,52 +4,31 @@ Note: Most auth is handled on the frontend with Supabase JS client.
 These endpoints are for backend token verification and user profile operations.
 """
 from flask import Blueprint, request, jsonify
-from functools import wraps
-from app.supabase_client import get_supabase, verify_token
+from app.auth import require_auth, get_current_profile, cache_profile, invalidate_profile
+from app.cache import invalidate_cache
+from app.errors import server_error
+from app.supabase_client import get_supabase
 
 auth_bp = Blueprint('auth', __name__)
 
 
-def require_auth(f):
-    """Decorator to require authentication for an endpoint."""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return jsonify({'error': 'No authorization header'}), 401
-        
-        try:
-            # Extract token from "Bearer <token>"
-            token = auth_header.split(' ')[1] if ' ' in auth_header else auth_header
-            user = verify_token(token)
-            request.current_user = user
-            return f(*args, **kwargs)
-        except Exception as e:
-            return jsonify({'error': str(e)}), 401
-    
-    return decorated_function
-
-
 @auth_bp.route('/me', methods=['GET'])
 @require_auth
 def get_current_user():
     """Get the current authenticated user's profile."""
     try:
-        supabase = get_supabase()
-        user = request.current_user
-        
-        # Get user profile from users table
-        result = supabase.table('users').select('*').eq('id', user.id).single().execute()
+        # Get user profile from users table (cached per user)
+        profile = get_current_profile()
         
-        if result.data:
+        if profile:
             return jsonify({
-                'user': result.data
+                'user': profile
             }), 200
         else:
             return jsonify({'error': 'User profile not found'}), 404
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 
 @auth_bp.route('/profile', methods=['PUT'])
@@ -61,19 +40,35 @@ def update_profile():
         user = request.current_user
         data = request.get_json()
         
-        # Fields that can be updated
-        allowed_fields = ['username', 'phone', 'location']
+        # Fields that can be updated; coordinates are otherwise looked up from location
+        allowed_fields = ['username', 'phone', 'location', 'latitude', 'longitude']
         update_data = {k: v for k, v in data.items() if k in allowed_fields}
         
         if not update_data:
             return jsonify({'error': 'No valid fields to update'}), 400
         
+        if ('latitude' in update_data) != ('longitude' in update_data):
+            return jsonify({'error': 'latitude and longitude must be updated together'}), 400
+        if 'latitude' in update_data and update_data['latitude'] is not None:
+            lat, lon = update_data['latitude'], update_data['longitude']
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (lat, lon)) \
+                    or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                return jsonify({'error': 'Invalid coordinates'}), 400
+        
         result = supabase.table('users').update(update_data).eq('id', user.id).execute()
         
+        if result.data:
+            cache_profile(result.data[0])
+        else:
+            invalidate_profile(user.id)
+        
+        # Products carry a copy of the farmer's username, phone and location
+        invalidate_cache('products')
+        
         return jsonify({
             'message': 'Profile updated successfully',
             'user': result.data[0] if result.data else None
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
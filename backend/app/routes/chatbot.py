@@ -1,105 +1,78 @@
 """
 Chatbot routes using Supabase.
 """
+import logging
 from flask import Blueprint, request, jsonify
-from app.supabase_client import get_supabase, verify_token
-from datetime import datetime
-from functools import wraps
+from app.auth import require_auth, optional_auth
+from app.availability import get_availability
+from app.chat_log import get_chat_log
+from app.chatbot_matcher import matcher
+from app.errors import server_error
+from app.price_index import get_price_index
+from app.supabase_client import get_supabase
+from datetime import datetime, timedelta, timezone
 import random
 
 chatbot_bp = Blueprint('chatbot', __name__)
+logger = logging.getLogger(__name__)
 
 
-def require_auth(f):
-    """Decorator to require authentication for an endpoint."""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return jsonify({'error': 'No authorization header'}), 401
-        
-        try:
-            token = auth_header.split(' ')[1] if ' ' in auth_header else auth_header
-            user = verify_token(token)
-            request.current_user = user
-            return f(*args, **kwargs)
-        except Exception as e:
-            return jsonify({'error': str(e)}), 401
-    
-    return decorated_function
-
-
-def optional_auth():
-    """Try to get user from auth header, but don't require it."""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header:
-        return None
-    
-    try:
-        token = auth_header.split(' ')[1] if ' ' in auth_header else auth_header
-        return verify_token(token)
-    except:
-        return None
+def format_quantity(value):
+    """A quantity or price for a reply: at most 2 decimals, no trailing zeros."""
+    # Sums of stock quantities pick up float noise (15.600000000000001)
+    return f'{float(value):.2f}'.rstrip('0').rstrip('.')
 
 
 # Mock responses in French and Kirundi (English removed)
 def check_price(keyword, language='fr'):
-    """Query market_prices table for a crop."""
+    """Look up the latest market price of a crop in the price index."""
     try:
-        supabase = get_supabase()
-        response = supabase.table('market_prices').select('*').ilike('crop_name', f'%{keyword}%').order('date_recorded', desc=True).limit(1).execute()
+        item = get_price_index().latest(keyword)
         
-        data = response.data
-        if not data:
+        if not item:
             if language == 'rn':
                 return f"Ntibishobotse kubona igiciro ca {keyword}."
             return f"Je n'ai pas trouvé de prix récent pour '{keyword}'."
             
-        item = data[0]
-        price = item['price']
+        price = format_quantity(item['price'])
         location = item['market_location']
         
         if language == 'rn':
             return f"Igiciro ca {item['crop_name']} i {location} ni {price} FBu/kg."
         return f"Le prix actuel pour {item['crop_name']} à {location} est de {price} FBu/kg."
     except Exception as e:
-        print(f"Error checking price: {e}")
+        logger.exception('Error checking price of %s', keyword)
         return "Désolé, je ne peux pas vérifier les prix pour le moment."
 
 def check_availability(keyword, language='fr'):
-    """Query products table for availability."""
+    """Look up in-stock offers of a crop in the availability snapshot."""
     try:
-        supabase = get_supabase()
-        # Find products matching name and with inventory > 0
-        response = supabase.table('products').select('*').ilike('name', f'%{keyword}%').gt('quantity_available', 0).limit(3).execute()
+        summary = get_availability().get(keyword)
         
-        data = response.data
-        if not data:
+        if not summary:
             if language == 'rn':
                 return f"Nta {keyword} dufite ubu."
             return f"Désolé, nous n'avons pas de '{keyword}' disponible pour le moment."
             
-        count = len(data)
+        count = summary['offers']
+        total = format_quantity(summary['total_kg'])
+        min_price = format_quantity(summary['min_price'])
+        max_price = format_quantity(summary['max_price'])
         if language == 'rn':
-            return f"Ego! Dufise {count} {keyword} zitandukanye. Urajya kuri 'Marché' kugura."
-        return f"Oui! Nous avons {count} offres pour '{keyword}'. Visitez la page 'Marché' pour commander."
+            return (f"Ego! Dufise {count} {keyword} zitandukanye ({total} kg, kuva {min_price} "
+                    f"gushika {max_price} FBu/kg). Urajya kuri 'Marché' kugura.")
+        return (f"Oui! Nous avons {count} offres pour '{keyword}' ({total} kg au total, "
+                f"de {min_price} à {max_price} FBu/kg). Visitez la page 'Marché' pour commander.")
     except Exception as e:
-        print(f"Error checking availability: {e}")
+        logger.exception('Error checking availability of %s', keyword)
         return "Désolé, je ne peux pas vérifier le stock pour le moment."
 
 def get_smart_response(message, language='fr'):
     """Generate a data-driven response."""
-    message_lower = message.lower()
-    
-    # Keyword extraction (simple)
-    # Define common crops to look for
-    crops = ['haricot', 'maïs', 'tomate', 'pomme de terre', 'riz', 'oignon', 'carotte', 
-             'ibiharage', 'ibigori', 'inyanya', 'ibirayi', 'umuceri']
-    
-    found_crop = next((crop for crop in crops if crop in message_lower), None)
+    intents, found_crop = matcher.match(message)
     
     # 1. Price Check Intent
-    if any(word in message_lower for word in ['prix', 'price', 'igiciro', 'coûte', 'gura']):
+    if 'price' in intents:
         if found_crop:
             return check_price(found_crop, language)
         else:
@@ -108,7 +81,7 @@ def get_smart_response(message, language='fr'):
             return "De quel produit voulez-vous connaître le prix? (Ex: Prix des haricots)"
 
     # 2. Availability/Buying Intent
-    elif any(word in message_lower for word in ['avez-vous', 'disponible', 'acheter', 'ntabwo', 'dufise', 'shaka']):
+    elif 'availability' in intents:
         if found_crop:
             return check_availability(found_crop, language)
         else:
@@ -117,13 +90,13 @@ def get_smart_response(message, language='fr'):
             return "Que cherchez-vous à acheter? (Ex: Avez-vous du maïs?)"
             
     # 3. Weather (Keep generic/mock for now as we don't have a weather API)
-    elif any(word in message_lower for word in ['météo', 'weather', 'ikirere', 'imvura']):
+    elif 'weather' in intents:
         if language == 'rn':
             return "Ikirere kimeze neza uyu munsi. Nta mvura itegenijwe."
         return "La météo est favorable aujourd'hui. Pas de pluie prévue dans l'immédiat."
         
     # 4. Greeting/Default
-    elif any(word in message_lower for word in ['bonjour', 'salut', 'bwakeye', 'bite']):
+    elif 'greeting' in intents:
         if language == 'rn':
             return "Bwakeye! Ndi FarmOn Assistant. Ni gute nagufasha?"
         return "Bonjour! Je suis l'assistant FarmOn. Comment puis-je vous aider (Prix, Stocks, Météo)?"
@@ -145,6 +118,7 @@ def ask_chatbot():
     
     message = data['message']
     language = data.get('language', 'fr')  # Default to French
+    received_at = datetime.now(timezone.utc)
     
     # Get smart response
     bot_response = get_smart_response(message, language)
@@ -153,27 +127,22 @@ def ask_chatbot():
     user = optional_auth()
     user_id = user.id if user else None
     
-    # Save messages to Supabase (if possible)
-    try:
-        supabase = get_supabase()
-        
-        # Save user message
-        supabase.table('chat_messages').insert({
+    # Save messages in the background; a full queue drops them rather
+    # than failing or slowing down the request
+    get_chat_log().submit([
+        {
             'user_id': user_id,
             'message_text': message,
-            'sender': 'user'
-        }).execute()
-        
-        # Save bot response
-        supabase.table('chat_messages').insert({
+            'sender': 'user',
+            'timestamp': received_at.isoformat()
+        },
+        {
             'user_id': user_id,
             'message_text': bot_response,
-            'sender': 'bot'
-        }).execute()
-        
-    except Exception as e:
-        # Don't fail the request if message saving fails
-        print(f"Failed to save chat messages: {e}")
+            'sender': 'bot',
+            'timestamp': max(datetime.now(timezone.utc), received_at + timedelta(microseconds=1)).isoformat()
+        }
+    ])
     
     return jsonify({
         'message': message,
@@ -183,6 +152,12 @@ def ask_chatbot():
     }), 200
 
 
+@chatbot_bp.route('/stats', methods=['GET'])
+def get_chat_log_stats():
+    """Get queue depth and write counters of the chat message writer."""
+    return jsonify(get_chat_log().stats()), 200
+
+
 @chatbot_bp.route('/history', methods=['GET'])
 @require_auth
 def get_chat_history():
@@ -208,4 +183,4 @@ def get_chat_history():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
@@ -0,0 +1,170 @@
+"""
+Streaming exports of the catalogue and the price history.
+
+Rows are fetched page by page with keyset pagination and written to the
+client as they arrive, in NDJSON (default) or CSV, so memory use does not
+depend on the size of the table.
+"""
+import csv
+import io
+import logging
+from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from app.pagination import apply_keyset, encode_cursor
+from app.routes.marketplace import LISTING_COLUMNS, _product_select
+from app.supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+export_bp = Blueprint('export', __name__)
+
+EXPORT_PAGE_SIZE = 1000
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+MARKET_PRICE_COLUMNS = ('id', 'crop_name', 'market_location', 'price', 'date_recorded')
+
+
+def _iter_rows(table, select, column, filters=(), page_size=EXPORT_PAGE_SIZE):
+    """
+    Yield every row of ``table`` ordered by ``(column, id)``, one page at a time.
+    
+    Args:
+        filters: ``(method, column, value)`` filters applied to every page
+    """
+    supabase = get_supabase()
+    cursor = None
+    while True:
+        query = supabase.table(table).select(select)
+        for method, filter_column, value in filters:
+            query = getattr(query, method)(filter_column, value)
+        query = apply_keyset(query, column, cursor, desc=False)
+        rows = query.limit(page_size).execute().data
+        
+        yield from rows
+        
+        if len(rows) < page_size:
+            return
+        cursor = encode_cursor(rows[-1][column], rows[-1]['id'])
+
+
+def _ndjson_lines(rows):
+    dumps = current_app.json.dumps
+    for row in rows:
+        yield dumps(row) + '\n'
+
+
+def _csv_lines(rows, columns, batch_size=EXPORT_PAGE_SIZE):
+    # Rows are written in batches to avoid one tiny chunk per row
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_response(rows, columns, name):
+    """
+    Stream ``rows`` in the format requested by ``format=``.
+    
+    The status line is sent before the first page is fetched, so a failure
+    during the export cannot change it: the error is logged and re-raised,
+    which makes the server drop the connection without the final chunk and
+    the client sees an incomplete response rather than a short export.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    def generate():
+        lines = _csv_lines(rows, columns) if export_format == 'csv' else _ndjson_lines(rows)
+        try:
+            yield from lines
+        except Exception:
+            logger.exception('Export of %s failed', name)
+            raise
+    
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{export_format}'
+    # Let reverse proxies pass chunks through instead of buffering the export
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _parse_since():
+    """
+    Read the ``since=`` ISO timestamp.
+    
+    Raises:
+        ValueError: If it is not a valid timestamp
+    """
+    since = request.args.get('since')
+    if since is None:
+        return None
+    try:
+        datetime.fromisoformat(since)
+    except ValueError:
+        raise ValueError('since must be an ISO 8601 timestamp')
+    return since
+
+
+@export_bp.route('/products', methods=['GET'])
+def export_products():
+    """
+    Export all products, oldest first.
+    
+    Query parameters:
+        format: ndjson (default) or csv
+        since: Only products created at or after this ISO timestamp; pass
+            the largest created_at already exported (rows at that exact
+            timestamp are sent again, deduplicate them by id)
+        category: Filter
+    """
+    try:
+        since = _parse_since()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    filters = []
+    if since:
+        filters.append(('gte', 'created_at', since))
+    if request.args.get('category'):
+        filters.append(('eq', 'category', request.args['category']))
+    
+    rows = _iter_rows('products', _product_select(), 'created_at', filters)
+    # image_variants (a JSON object) is only exported as NDJSON; CSV keeps image_url
+    columns = [c for c in LISTING_COLUMNS if c != 'image_variants']
+    return _export_response(rows, columns, 'products')
+
+
+@export_bp.route('/market-prices', methods=['GET'])
+def export_market_prices():
+    """
+    Export the market price history, oldest first.
+    
+    Query parameters:
+        format: ndjson (default) or csv
+        since: Only prices recorded at or after this ISO timestamp (same
+            semantics as for products)
+        crop: Filter on crop_name
+    """
+    try:
+        since = _parse_since()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    filters = []
+    if since:
+        filters.append(('gte', 'date_recorded', since))
+    if request.args.get('crop'):
+        filters.append(('eq', 'crop_name', request.args['crop']))
+    
+    rows = _iter_rows('market_prices', ','.join(MARKET_PRICE_COLUMNS), 'date_recorded', filters)
+    return _export_response(rows, list(MARKET_PRICE_COLUMNS), 'market_prices')
@@ -1,35 +1,245 @@
 """
 Marketplace routes using Supabase.
 """
-from flask import Blueprint, request, jsonify
-from app.supabase_client import get_supabase, verify_token
-from functools import wraps
+import csv
+import io
+import json
+import math
+from flask import Blueprint, current_app, request, jsonify
+from app.auth import require_auth, get_current_profile, get_prefetched
+from app.availability import invalidate_availability
+from app.cache import cached_response, invalidate_cache
+from app.chatbot_matcher import matcher, normalize_text
+from app.concurrency import fan_out
+from app.errors import server_error
+from app.images import ImageError, check_upload_size, ingest_image, read_upload
+from app.pagination import apply_keyset, decode_cursor, split_page
+from app.supabase_client import get_supabase
+from app.validation import validate_product
 
 marketplace_bp = Blueprint('marketplace', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
 
-def require_auth(f):
-    """Decorator to require authentication for an endpoint."""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return jsonify({'error': 'No authorization header'}), 401
-        
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_QUERY_LENGTH = 100
+
+MAX_SUMMARY_DAYS = 365
+SUMMARY_BUCKETS = ('day', 'week')
+
+DEFAULT_RADIUS_KM = 25
+MAX_RADIUS_KM = 500
+
+MAX_BULK_ROWS = 5000
+BULK_CHUNK_SIZE = 500
+
+PRODUCT_COLUMNS = (
+    'id', 'farmer_id', 'name', 'category', 'price_per_kg',
+    'quantity_available', 'description', 'image_url', 'image_variants',
+    'latitude', 'longitude', 'created_at'
+)
+
+# The farmer's profile, copied onto products by database triggers
+FARMER_FIELDS = ('farmer_name', 'farmer_phone', 'farmer_location')
+
+LISTING_COLUMNS = PRODUCT_COLUMNS + FARMER_FIELDS
+
+IMAGE_UPLOAD_HINT = 'Send the image as the multipart field "image" or as an image/* body'
+
+
+def _parse_product_fields(fields_param):
+    """
+    Parse a ``fields=`` projection into the columns to select.
+    
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    if not fields_param:
+        return None
+    
+    requested = [f.strip() for f in fields_param.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in LISTING_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    
+    # id and created_at are needed to build the next cursor
+    return list(dict.fromkeys(['id', 'created_at'] + requested))
+
+
+def _product_select(columns=None):
+    """Build the PostgREST select for products (all listing columns by default)."""
+    # Explicit columns keep internal ones (e.g. search_vector) out of responses
+    return ','.join(columns or LISTING_COLUMNS)
+
+
+def _read_bulk_rows():
+    """
+    Yield the submitted rows of a bulk request.
+    
+    ``text/csv`` (with a header row) and ``application/x-ndjson`` bodies are
+    read from the request stream line by line; anything else must be a JSON
+    array. Rows that cannot be parsed are yielded as ``ValueError`` so they
+    are reported with the other row errors.
+    
+    Raises:
+        ValueError: If a JSON body is not an array
+    """
+    if request.mimetype == 'text/csv':
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+        for row in csv.DictReader(stream):
+            # Empty cells are treated as "not provided"
+            yield {k.strip(): v for k, v in row.items() if k and v not in (None, '')}
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in request.stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield ValueError('Invalid JSON')
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            raise ValueError('Expected a JSON array, CSV or NDJSON body')
+        yield from data
+
+
+def _validate_bulk_rows(partial=False):
+    """
+    Validate every submitted row in one pass.
+    
+    Returns:
+        tuple: The cleaned rows and the list of ``{'row', 'error'}`` errors
+            (rows are numbered from 1, excluding a CSV header)
+    
+    Raises:
+        ValueError: If the body is not a supported format or has too many rows
+    """
+    products = []
+    errors = []
+    seen_ids = set()
+    
+    for number, row in enumerate(_read_bulk_rows(), start=1):
+        if number > MAX_BULK_ROWS:
+            raise ValueError(f'At most {MAX_BULK_ROWS} products per request')
+        if isinstance(row, ValueError):
+            errors.append({'row': number, 'error': str(row)})
+            continue
+        
+        product_id = None
+        if partial:
+            try:
+                product_id = int(row.get('id')) if isinstance(row, dict) else None
+            except (TypeError, ValueError):
+                pass
+            if product_id is None:
+                errors.append({'row': number, 'error': 'Missing or invalid product id'})
+                continue
+            if product_id in seen_ids:
+                errors.append({'row': number, 'error': f'Duplicate product id: {product_id}'})
+                continue
+            seen_ids.add(product_id)
+        
+        product, error = validate_product(row, partial=partial)
+        if error:
+            errors.append({'row': number, 'error': error})
+            continue
+        if partial:
+            product['id'] = product_id
+        products.append(product)
+    
+    if not products and not errors:
+        raise ValueError('No products submitted')
+    return products, errors
+
+
+def _fetch_product_owner(product_id):
+    """Get the farmer_id of a product (None if it does not exist)."""
+    result = get_supabase().table('products').select('farmer_id').eq('id', product_id).execute()
+    return result.data[0] if result.data else None
+
+
+def _parse_near(near):
+    """
+    Parse a ``near=latitude,longitude`` parameter.
+    
+    Raises:
+        ValueError: If it is not a valid coordinate pair
+    """
+    try:
+        lat, lon = (float(part) for part in near.split(','))
+    except ValueError:
+        raise ValueError('near must be "latitude,longitude"')
+    # Also rejects nan
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('near is out of range')
+    return lat, lon
+
+
+def _distance_value(value):
+    distance = float(value)
+    if not math.isfinite(distance):
+        raise ValueError('Invalid distance')
+    return distance
+
+
+def _get_nearby_products(lat, lon, radius_km, filters, limit, cursor, columns):
+    """A page of products within ``radius_km`` of ``(lat, lon)``, nearest first."""
+    after_distance = after_id = None
+    if cursor:
         try:
-            token = auth_header.split(' ')[1] if ' ' in auth_header else auth_header
-            user = verify_token(token)
-            request.current_user = user
-            return f(*args, **kwargs)
-        except Exception as e:
-            return jsonify({'error': str(e)}), 401
+            after_distance, after_id = decode_cursor(cursor, parse_value=_distance_value)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    result = get_supabase().rpc('products_near', {
+        'lat': lat,
+        'lon': lon,
+        'radius_km': radius_km,
+        'category_filter': filters['category'],
+        'min_price': filters['min_price'],
+        'max_price': filters['max_price'],
+        'page_limit': limit + 1,
+        'after_distance': after_distance,
+        'after_id': after_id
+    }).execute()
+    rows, next_cursor = split_page(result.data or [], limit, 'distance_m')
     
-    return decorated_function
+    fields = None if columns is None else set(columns)
+    products = []
+    for row in rows:
+        row['distance_km'] = round(row.pop('distance_m') / 1000, 2)
+        if fields is not None:
+            row = {k: v for k, v in row.items() if k in fields or k == 'distance_km'}
+        products.append(row)
+    
+    return jsonify({
+        'products': products,
+        'count': len(products),
+        'next_cursor': next_cursor
+    }), 200
+
+
+def _chunks(rows, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
 
 
 @marketplace_bp.route('/products', methods=['GET'])
+@cached_response('products')
 def get_products():
-    """Get all products with optional filters."""
+    """
+    Get a page of products with optional filters.
+    
+    Query parameters:
+        category, min_price, max_price: Filters
+        limit: Page size (default 50, max 200)
+        cursor: The next_cursor of the previous page
+        fields: Comma-separated columns to return (id and created_at are always included)
+        near: "latitude,longitude"; only products within radius_km (default 25,
+            max 500) are returned, nearest first, with their distance_km
+    """
     try:
         supabase = get_supabase()
         
@@ -37,11 +247,37 @@ def get_products():
         category = request.args.get('category')
         min_price = request.args.get('min_price', type=float)
         max_price = request.args.get('max_price', type=float)
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        cursor = request.args.get('cursor')
+        
+        if limit < 1:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+        
+        try:
+            columns = _parse_product_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        near = request.args.get('near')
+        if near:
+            try:
+                lat, lon = _parse_near(near)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            radius_km = request.args.get('radius_km', DEFAULT_RADIUS_KM, type=float)
+            if not 0 < radius_km <= MAX_RADIUS_KM:
+                return jsonify({'error': f'radius_km must be between 0 and {MAX_RADIUS_KM}'}), 400
+            filters = {'category': category, 'min_price': min_price, 'max_price': max_price}
+            return _get_nearby_products(lat, lon, radius_km, filters, limit, cursor, columns)
         
         # Build query
-        query = supabase.table('products').select(
-            '*, farmer:users!farmer_id(username, phone, location)'
-        ).order('created_at', desc=True)
+        query = supabase.table('products').select(_product_select(columns))
+        
+        try:
+            query = apply_keyset(query, 'created_at', cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if category:
             query = query.eq('category', category)
@@ -52,53 +288,88 @@ def get_products():
         if max_price is not None:
             query = query.lte('price_per_kg', max_price)
         
-        result = query.execute()
+        # Fetch one extra row to know whether there is a next page
+        result = query.limit(limit + 1).execute()
+        products, next_cursor = split_page(result.data, limit, 'created_at')
         
-        # Transform data to match expected format
-        products = []
-        for product in result.data:
-            farmer = product.pop('farmer', {}) or {}
-            products.append({
-                **product,
-                'farmer_name': farmer.get('username'),
-                'farmer_phone': farmer.get('phone'),
-                'farmer_location': farmer.get('location')
-            })
+        return jsonify({
+            'products': products,
+            'count': len(products),
+            'next_cursor': next_cursor
+        }), 200
+        
+    except Exception as e:
+        return server_error(e)
+
+
+@marketplace_bp.route('/products/search', methods=['GET'])
+@cached_response('products')
+def search_products():
+    """
+    Search products by name, category and description, ranked by relevance.
+    
+    Query parameters:
+        q: Search text (typos and Kirundi crop names are tolerated)
+        limit: Page size (default 20, max 200)
+        offset: Number of results to skip (next_offset of the previous page)
+    """
+    try:
+        supabase = get_supabase()
+        
+        q = (request.args.get('q') or '').strip()
+        limit = request.args.get('limit', DEFAULT_SEARCH_PAGE_SIZE, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        
+        if not q:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+        if len(q) > MAX_SEARCH_QUERY_LENGTH:
+            return jsonify({'error': f'q must be at most {MAX_SEARCH_QUERY_LENGTH} characters'}), 400
+        if limit < 1 or offset < 0:
+            return jsonify({'error': 'limit must be positive and offset non-negative'}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+        
+        # Also search the French crop name of Kirundi/unaccented terms ("ibiharage" -> "haricot")
+        crop = matcher.find_crop(q)
+        synonyms = crop if crop and normalize_text(crop) not in normalize_text(q) else None
+        
+        result = supabase.rpc('search_products', {
+            'q': q,
+            'synonyms': synonyms,
+            'page_limit': limit + 1,
+            'page_offset': offset
+        }).execute()
+        
+        rows = result.data or []
+        products = rows[:limit]
         
         return jsonify({
             'products': products,
-            'count': len(products)
+            'count': len(products),
+            'next_offset': offset + limit if len(rows) > limit else None
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 
 @marketplace_bp.route('/products/<int:product_id>', methods=['GET'])
+@cached_response('products')
 def get_product(product_id):
     """Get a specific product by ID."""
     try:
         supabase = get_supabase()
         
         result = supabase.table('products').select(
-            '*, farmer:users!farmer_id(username, phone, location)'
+            _product_select()
         ).eq('id', product_id).single().execute()
         
         if not result.data:
             return jsonify({'error': 'Product not found'}), 404
         
-        product = result.data
-        farmer = product.pop('farmer', {}) or {}
-        
-        return jsonify({
-            **product,
-            'farmer_name': farmer.get('username'),
-            'farmer_phone': farmer.get('phone'),
-            'farmer_location': farmer.get('location')
-        }), 200
+        return jsonify(result.data), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
 
 
 @marketplace_bp.route('/products', methods=['POST'])
@@ -110,43 +381,21 @@ def create_product():
         user = request.current_user
         
         # Get user profile to check role
-        user_result = supabase.table('users').select('role').eq('id', user.id).single().execute()
+        profile = get_current_profile()
         
-        if not user_result.data or user_result.data.get('role') != 'farmer':
+        if not profile or profile.get('role') != 'farmer':
             return jsonify({'error': 'Only farmers can create product listings'}), 403
         
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['name', 'category', 'price_per_kg', 'quantity_available']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-        
-        # Validate numeric fields
-        try:
-            price = float(data['price_per_kg'])
-            quantity = float(data['quantity_available'])
-            
-            if price <= 0:
-                return jsonify({'error': 'Price must be greater than 0'}), 400
-            if quantity <= 0:
-                return jsonify({'error': 'Quantity must be greater than 0'}), 400
-        except ValueError:
-            return jsonify({'error': 'Price and quantity must be valid numbers'}), 400
+        product_data, error = validate_product(request.get_json())
+        if error:
+            return jsonify({'error': error}), 400
         
         # Create product
-        product_data = {
-            'farmer_id': user.id,
-            'name': data['name'],
-            'category': data['category'],
-            'price_per_kg': price,
-            'quantity_available': quantity,
-            'description': data.get('description'),
-            'image_url': data.get('image_url')
-        }
+        product_data['farmer_id'] = user.id
         
         result = supabase.table('products').insert(product_data).execute()
+        invalidate_cache('products')
+        invalidate_availability()
         
         return jsonify({
             'message': 'Product created successfully',
@@ -154,24 +403,24 @@ def create_product():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': 'Failed to create product', 'details': str(e)}), 500
+        return server_error(e, 'Failed to create product')
 
 
 @marketplace_bp.route('/products/<int:product_id>', methods=['PUT'])
-@require_auth
+@require_auth(prefetch=_fetch_product_owner)
 def update_product(product_id):
     """Update a product listing (owner only)."""
     try:
         supabase = get_supabase()
         user = request.current_user
         
-        # Check if product exists and user owns it
-        product_result = supabase.table('products').select('farmer_id').eq('id', product_id).single().execute()
+        # Check if product exists and user owns it (looked up by require_auth)
+        product = get_prefetched()
         
-        if not product_result.data:
+        if not product:
             return jsonify({'error': 'Product not found'}), 404
         
-        if product_result.data.get('farmer_id') != user.id:
+        if product.get('farmer_id') != user.id:
             return jsonify({'error': 'You can only update your own products'}), 403
         
         data = request.get_json()
@@ -183,7 +432,13 @@ def update_product(product_id):
         if not update_data:
             return jsonify({'error': 'No valid fields to update'}), 400
         
+        # Variants of a previous upload no longer match a new image_url
+        if 'image_url' in update_data:
+            update_data['image_variants'] = None
+        
         result = supabase.table('products').update(update_data).eq('id', product_id).execute()
+        invalidate_cache('products')
+        invalidate_availability()
         
         return jsonify({
             'message': 'Product updated successfully',
@@ -191,35 +446,206 @@ def update_product(product_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': 'Failed to update product', 'details': str(e)}), 500
+        return server_error(e, 'Failed to update product')
+
+
+@marketplace_bp.route('/products/<int:product_id>/image', methods=['POST'])
+@require_auth(prefetch=_fetch_product_owner)
+def upload_product_image(product_id):
+    """
+    Upload the photo of a product (owner only).
+    
+    The file is sent as the multipart field ``image`` or as the raw body with
+    an image/* Content-Type. It is stored as resized JPEG variants and a WebP
+    thumbnail; image_url is set to the default width and image_variants to
+    the srcset-ready URL map.
+    """
+    try:
+        supabase = get_supabase()
+        user = request.current_user
+        
+        product = get_prefetched()
+        
+        if not product:
+            return jsonify({'error': 'Product not found'}), 404
+        
+        if product.get('farmer_id') != user.id:
+            return jsonify({'error': 'You can only update your own products'}), 403
+        
+        max_bytes = current_app.config['IMAGE_MAX_UPLOAD_BYTES']
+        multipart = request.mimetype == 'multipart/form-data'
+        if not multipart and not request.mimetype.startswith('image/'):
+            return jsonify({'error': IMAGE_UPLOAD_HINT}), 400
+        
+        try:
+            # Before request.files, which spools the whole body to disk
+            check_upload_size(request.content_length, max_bytes, multipart=multipart)
+            if multipart:
+                upload = request.files.get('image')
+                if upload is None:
+                    return jsonify({'error': IMAGE_UPLOAD_HINT}), 400
+                stream = upload.stream
+            else:
+                stream = request.stream
+            image = ingest_image(*read_upload(stream, max_bytes))
+        except ImageError as e:
+            return jsonify({'error': str(e)}), e.status
+        
+        result = supabase.table('products').update({
+            'image_url': image['src'],
+            'image_variants': image
+        }).eq('id', product_id).execute()
+        invalidate_cache('products')
+        
+        return jsonify({
+            'message': 'Image uploaded successfully',
+            'image': image,
+            'product': result.data[0] if result.data else None
+        }), 200
+        
+    except Exception as e:
+        return server_error(e, 'Failed to upload image')
 
 
 @marketplace_bp.route('/products/<int:product_id>', methods=['DELETE'])
-@require_auth
+@require_auth(prefetch=_fetch_product_owner)
 def delete_product(product_id):
     """Delete a product listing (owner only)."""
     try:
         supabase = get_supabase()
         user = request.current_user
         
-        # Check if product exists and user owns it
-        product_result = supabase.table('products').select('farmer_id').eq('id', product_id).single().execute()
+        # Check if product exists and user owns it (looked up by require_auth)
+        product = get_prefetched()
         
-        if not product_result.data:
+        if not product:
             return jsonify({'error': 'Product not found'}), 404
         
-        if product_result.data.get('farmer_id') != user.id:
+        if product.get('farmer_id') != user.id:
             return jsonify({'error': 'You can only delete your own products'}), 403
         
         supabase.table('products').delete().eq('id', product_id).execute()
+        invalidate_cache('products')
+        invalidate_availability()
         
         return jsonify({'message': 'Product deleted successfully'}), 200
         
     except Exception as e:
-        return jsonify({'error': 'Failed to delete product', 'details': str(e)}), 500
+        return server_error(e, 'Failed to delete product')
+
+
+@marketplace_bp.route('/products/bulk', methods=['POST'])
+@require_auth
+def create_products_bulk():
+    """
+    Create many product listings at once (farmers only).
+    
+    Accepts a JSON array, a CSV file or NDJSON. Nothing is written unless
+    every row is valid; rows are then inserted in chunks of BULK_CHUNK_SIZE.
+    """
+    created = []
+    try:
+        supabase = get_supabase()
+        user = request.current_user
+        
+        profile = get_current_profile()
+        
+        if not profile or profile.get('role') != 'farmer':
+            return jsonify({'error': 'Only farmers can create product listings'}), 403
+        
+        try:
+            products, errors = _validate_bulk_rows()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if errors:
+            return jsonify({'error': 'Validation failed', 'errors': errors}), 400
+        
+        try:
+            for chunk in _chunks(products):
+                for product in chunk:
+                    product['farmer_id'] = user.id
+                result = supabase.table('products').insert(chunk).execute()
+                created.extend(row['id'] for row in result.data or [])
+        finally:
+            if created:
+                invalidate_cache('products')
+                invalidate_availability()
+        
+        return jsonify({
+            'message': f'{len(created)} products created successfully',
+            'created': len(created),
+            'ids': created
+        }), 201
+        
+    except Exception as e:
+        return server_error(e, 'Failed to create products', created=len(created))
+
+
+@marketplace_bp.route('/products/bulk', methods=['PATCH'])
+@require_auth
+def update_products_bulk():
+    """
+    Update many product listings at once (owner only).
+    
+    Each row has the product ``id`` and the fields to change. Ownership of
+    all rows is checked before anything is written; updates are then applied
+    in chunks by the ``bulk_update_products`` function, which only touches
+    the submitted fields.
+    """
+    updated = []
+    try:
+        supabase = get_supabase()
+        user = request.current_user
+        
+        try:
+            updates, errors = _validate_bulk_rows(partial=True)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if errors:
+            return jsonify({'error': 'Validation failed', 'errors': errors}), 400
+        
+        # One in.(...) lookup per chunk keeps the URL within server limits;
+        # the chunks are independent and fetched concurrently
+        lookups = [
+            lambda chunk=chunk: supabase.table('products').select('id, farmer_id').in_('id', chunk).execute().data
+            for chunk in _chunks([update['id'] for update in updates])
+        ]
+        owners = {}
+        for rows in fan_out(*lookups):
+            owners.update((row['id'], row['farmer_id']) for row in rows or [])
+        
+        for number, update in enumerate(updates, start=1):
+            if update['id'] not in owners:
+                errors.append({'row': number, 'error': f"Product not found: {update['id']}"})
+            elif owners[update['id']] != user.id:
+                errors.append({'row': number, 'error': 'You can only update your own products'})
+        
+        if errors:
+            return jsonify({'error': 'Some products cannot be updated', 'errors': errors}), 403
+        
+        try:
+            for chunk in _chunks(updates):
+                result = supabase.rpc('bulk_update_products', {'owner': user.id, 'updates': chunk}).execute()
+                updated.extend(result.data or [])
+        finally:
+            if updated:
+                invalidate_cache('products')
+                invalidate_availability()
+        
+        return jsonify({
+            'message': f'{len(updated)} products updated successfully',
+            'updated': len(updated),
+            'ids': updated
+        }), 200
+        
+    except Exception as e:
+        return server_error(e, 'Failed to update products', updated=len(updated))
 
 
 @marketplace_bp.route('/market-prices', methods=['GET'])
+@cached_response('market_prices')
 def get_market_prices():
     """Get latest market prices."""
     try:
@@ -235,10 +661,55 @@ def get_market_prices():
         
         result = query.execute()
         
+        # No Last-Modified: a backfilled price has an older date_recorded, so
+        # only the ETag (a hash of the body) tells clients what changed
         return jsonify({
             'prices': result.data,
             'count': len(result.data)
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return server_error(e)
+
+
+@marketplace_bp.route('/market-prices/summary', methods=['GET'])
+@cached_response('market_prices')
+def get_market_price_summary():
+    """
+    Get per crop and market the latest and previous price, the percentage
+    change and min/avg/max buckets over a time window, computed in SQL.
+    
+    Query parameters:
+        days: Window size in days (default 30, max 365)
+        bucket: 'day' or 'week' (default 'day')
+        crop: Optional exact crop name
+    """
+    try:
+        supabase = get_supabase()
+        
+        days = request.args.get('days', 30, type=int)
+        bucket = request.args.get('bucket', 'day')
+        crop_name = request.args.get('crop')
+        
+        if not 1 <= days <= MAX_SUMMARY_DAYS:
+            return jsonify({'error': f'days must be between 1 and {MAX_SUMMARY_DAYS}'}), 400
+        if bucket not in SUMMARY_BUCKETS:
+            return jsonify({'error': f"bucket must be one of: {', '.join(SUMMARY_BUCKETS)}"}), 400
+        
+        result = supabase.rpc('market_price_summary', {
+            'window_days': days,
+            'bucket_size': bucket,
+            'crop': crop_name
+        }).execute()
+        
+        summary = result.data or []
+        
+        return jsonify({
+            'summary': summary,
+            'count': len(summary),
+            'days': days,
+            'bucket': bucket
+        }), 200
+        
+    except Exception as e:
+        return server_error(e)
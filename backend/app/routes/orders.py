@@ -0,0 +1,230 @@
+"""
+Order routes using Supabase.
+
+Stock is reserved by the ``place_order`` database function, which decrements
+``quantity_available`` with a conditional update in the same statement that
+records the order, so concurrent buyers of one lot can never oversell it.
+"""
+import random
+import time
+import uuid
+import httpx
+from flask import Blueprint, request, jsonify, current_app
+from postgrest.exceptions import APIError
+from app.auth import require_auth
+from app.availability import invalidate_availability
+from app.cache import invalidate_cache
+from app.errors import server_error
+from app.pagination import apply_keyset, split_page
+from app.supabase_client import get_supabase
+
+orders_bp = Blueprint('orders', __name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Serialization failure, deadlock, and a concurrent request with the same
+# idempotency key (the retry then returns the order it created)
+RETRYABLE_SQLSTATES = {'40001', '40P01', '23505'}
+
+# Raised by place_order when an Idempotency-Key is reused for another buyer
+# (409) or for a different product or quantity (422)
+IDEMPOTENCY_ERRORS = {'PT409': 409, 'PT422': 422}
+
+
+def _is_retryable(error):
+    if isinstance(error, APIError):
+        return error.code in RETRYABLE_SQLSTATES
+    return isinstance(error, httpx.TransportError)
+
+
+def _rpc_with_retries(fn, params):
+    """
+    Call a database function, retrying transient failures with jittered backoff.
+    
+    Only functions that are safe to repeat (idempotent) may be called this way.
+    """
+    attempts = current_app.config.get('ORDER_RETRY_ATTEMPTS', 3)
+    backoff = current_app.config.get('ORDER_RETRY_BACKOFF', 0.05)
+    for attempt in range(attempts):
+        try:
+            return get_supabase().rpc(fn, params).execute().data or []
+        except Exception as e:
+            if attempt == attempts - 1 or not _is_retryable(e):
+                raise
+            time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def _reservation_error(product_id, user_id, quantity):
+    """Explain why ``place_order`` reserved nothing."""
+    result = get_supabase().table('products').select(
+        'farmer_id, quantity_available'
+    ).eq('id', product_id).execute()
+    
+    if not result.data:
+        return jsonify({'error': 'Product not found'}), 404
+    
+    product = result.data[0]
+    if product['farmer_id'] == user_id:
+        return jsonify({'error': 'You cannot order your own product'}), 403
+    
+    return jsonify({
+        'error': 'Not enough stock available',
+        'requested': quantity,
+        'quantity_available': product['quantity_available']
+    }), 409
+
+
+@orders_bp.route('', methods=['POST'])
+@require_auth
+def place_order():
+    """
+    Order a quantity of a product and reserve it.
+    
+    An ``Idempotency-Key`` header (UUID) makes client retries safe: a key
+    the buyer already used for the same product and quantity returns the
+    original order instead of a new one.
+    """
+    try:
+        user = request.current_user
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            product_id = int(data['product_id'])
+            quantity = round(float(data['quantity']), 2)
+        except KeyError as e:
+            return jsonify({'error': f'Missing required field: {e.args[0]}'}), 400
+        except (TypeError, ValueError):
+            return jsonify({'error': 'product_id and quantity must be valid numbers'}), 400
+        
+        if quantity <= 0:
+            return jsonify({'error': 'Quantity must be greater than 0'}), 400
+        
+        request_key = request.headers.get('Idempotency-Key') or str(uuid.uuid4())
+        try:
+            request_key = str(uuid.UUID(request_key))
+        except ValueError:
+            return jsonify({'error': 'Idempotency-Key must be a UUID'}), 400
+        
+        try:
+            orders = _rpc_with_retries('place_order', {
+                'p_buyer': user.id,
+                'p_product': product_id,
+                'p_quantity': quantity,
+                'p_request_key': request_key
+            })
+        except APIError as e:
+            if e.code not in IDEMPOTENCY_ERRORS:
+                raise
+            return jsonify({'error': e.message}), IDEMPOTENCY_ERRORS[e.code]
+        
+        if not orders:
+            return _reservation_error(product_id, user.id, quantity)
+        
+        invalidate_cache('products')
+        invalidate_availability()
+        
+        return jsonify({
+            'message': 'Order placed successfully',
+            'order': orders[0]
+        }), 201
+    
+    except Exception as e:
+        return server_error(e, 'Failed to place order')
+
+
+@orders_bp.route('', methods=['GET'])
+@require_auth
+def get_orders():
+    """
+    Get a page of the current user's orders, newest first.
+    
+    Query parameters:
+        role: buyer (default, orders placed) or farmer (orders received)
+        status: pending or cancelled
+        limit: Page size (default 50, max 200)
+        cursor: The next_cursor of the previous page
+    """
+    try:
+        user = request.current_user
+        
+        role = request.args.get('role', 'buyer')
+        if role not in ('buyer', 'farmer'):
+            return jsonify({'error': 'role must be buyer or farmer'}), 400
+        
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        if limit < 1:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+        
+        query = get_supabase().table('orders').select('*').eq(f'{role}_id', user.id)
+        
+        if request.args.get('status'):
+            query = query.eq('status', request.args['status'])
+        
+        try:
+            query = apply_keyset(query, 'created_at', request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        result = query.limit(limit + 1).execute()
+        orders, next_cursor = split_page(result.data, limit, 'created_at')
+        
+        return jsonify({
+            'orders': orders,
+            'count': len(orders),
+            'next_cursor': next_cursor
+        }), 200
+    
+    except Exception as e:
+        return server_error(e)
+
+
+@orders_bp.route('/<int:order_id>', methods=['GET'])
+@require_auth
+def get_order(order_id):
+    """Get an order (buyer or farmer only)."""
+    try:
+        user = request.current_user
+        
+        result = get_supabase().table('orders').select('*').eq('id', order_id).execute()
+        
+        if not result.data:
+            return jsonify({'error': 'Order not found'}), 404
+        
+        order = result.data[0]
+        if user.id not in (order['buyer_id'], order['farmer_id']):
+            return jsonify({'error': 'You can only view your own orders'}), 403
+        
+        return jsonify({'order': order}), 200
+    
+    except Exception as e:
+        return server_error(e)
+
+
+@orders_bp.route('/<int:order_id>/cancel', methods=['POST'])
+@require_auth
+def cancel_order(order_id):
+    """Cancel a pending order (buyer or farmer) and release its stock."""
+    try:
+        user = request.current_user
+        
+        # Cancelling twice is a no-op, so the call can be retried
+        orders = _rpc_with_retries('cancel_order', {'p_order': order_id, 'p_user': user.id})
+        
+        if not orders:
+            result = get_supabase().table('orders').select('buyer_id, farmer_id, status').eq('id', order_id).execute()
+            if not result.data or user.id not in (result.data[0]['buyer_id'], result.data[0]['farmer_id']):
+                return jsonify({'error': 'Order not found'}), 404
+            return jsonify({'error': f"Order is already {result.data[0]['status']}"}), 409
+        
+        invalidate_cache('products')
+        invalidate_availability()
+        
+        return jsonify({
+            'message': 'Order cancelled successfully',
+            'order': orders[0]
+        }), 200
+    
+    except Exception as e:
+        return server_error(e, 'Failed to cancel order')
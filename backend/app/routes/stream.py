@@ -0,0 +1,93 @@
+"""
+Server-sent events feed of market price and product changes.
+
+Each event is sent as ``event: <topic>`` (market_prices or products) with
+``data: {"action", "data", "at"}``; actions are created, updated, deleted
+and stock (only quantity_available changed). A ``reset`` event means events
+were dropped for this client: refetch the lists, then keep listening.
+
+Every open stream holds a connection for as long as the client listens, so
+serve it with gevent workers (GUNICORN_WORKER_CLASS=gevent). Under threaded
+workers each stream holds a thread, so only STREAM_THREADED_MAX_SUBSCRIBERS
+streams per worker are accepted and the others get a 503: the threads stay
+available to the rest of the API.
+"""
+from flask import Blueprint, Response, current_app, request, jsonify
+from app.concurrency import gevent_active
+from app.stream import TOPICS, BrokerFull, format_event, get_change_source, get_event_broker, parse_event_id
+
+stream_bp = Blueprint('stream', __name__)
+
+
+def _parse_topics(topics_param):
+    """
+    Split a ``topics=`` parameter (default: all topics).
+
+    Raises:
+        ValueError: If an unknown topic is requested
+    """
+    if not topics_param:
+        return TOPICS
+    topics = [t.strip() for t in topics_param.split(',') if t.strip()]
+    unknown = [t for t in topics if t not in TOPICS]
+    if unknown or not topics:
+        raise ValueError(f"topics must be among: {', '.join(TOPICS)}")
+    return topics
+
+
+@stream_bp.route('', methods=['GET'])
+def stream_changes():
+    """
+    Stream changes as server-sent events.
+
+    Query parameters:
+        topics: Comma-separated topics (default: market_prices,products)
+
+    Headers:
+        Last-Event-ID: Sent by EventSource on reconnect; missed events are replayed
+    """
+    try:
+        topics = _parse_topics(request.args.get('topics'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    last_position = parse_event_id(request.headers.get('Last-Event-ID'))
+    heartbeat = current_app.config.get('STREAM_HEARTBEAT_INTERVAL', 15)
+    broker = get_event_broker()
+
+    # Greenlets are cheap; threads are shared with every other endpoint
+    limit = None if gevent_active() else current_app.config.get('STREAM_THREADED_MAX_SUBSCRIBERS', 2)
+    try:
+        subscription = broker.subscribe(topics, last_position, limit=limit)
+    except BrokerFull:
+        return jsonify({'error': 'Too many stream subscribers, retry later'}), 503, {'Retry-After': '60'}
+    get_change_source().ensure_started()
+
+    def generate():
+        try:
+            # Reconnect delay for EventSource (milliseconds)
+            yield 'retry: 5000\n\n'
+            while True:
+                lagged, events = subscription.get(timeout=heartbeat)
+                if lagged:
+                    yield 'event: reset\ndata: {}\n\n'
+                for event in events:
+                    yield format_event(event)
+                if not lagged and not events:
+                    # Keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+        finally:
+            # Also runs when the client disconnects
+            broker.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Let reverse proxies pass events through instead of buffering them
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@stream_bp.route('/stats', methods=['GET'])
+def stream_stats():
+    """Subscriber and event counts of this worker process."""
+    return jsonify(get_event_broker().stats()), 200
@@ -0,0 +1,323 @@
+"""
+Live feed of market price and product changes (GET /api/stream).
+
+Each worker process reads upstream changes once and fans them out to all of
+its subscribers:
+
+- PollingChangeSource polls the ``change_events`` table, which database
+  triggers append to on every market price insert and product write, with
+  one ``read_change_events`` call per interval while anyone is subscribed.
+- LocalChangeSource is an in-process stand-in fed by ``publish()`` (tests
+  and local development without the table).
+
+The EventBroker keeps a bounded buffer per subscriber. A subscriber that
+falls more than STREAM_CLIENT_BUFFER events behind loses the oldest ones and
+is told to refetch (a ``reset`` event) rather than holding memory for a slow
+client. The last STREAM_HISTORY events are kept so that a client reconnecting
+with ``Last-Event-ID`` gets what it missed.
+
+Events are ordered by their ``position``, sent as the SSE id: ``<txid>-<id>``
+for the table (the same order in every worker), ``<id>`` for the local source.
+"""
+import collections
+import itertools
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from app.supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ('market_prices', 'products')
+
+
+class BrokerFull(Exception):
+    """The process already serves as many subscribers as it may."""
+
+
+class Subscription:
+    """The pending events of one client, in a bounded buffer."""
+
+    def __init__(self, topics, buffer_size):
+        self.topics = frozenset(topics)
+        self._events = collections.deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._lagged = False
+        # Whether the client has a position to resume from (a Last-Event-ID
+        # or an event it was sent); only then can it miss events
+        self.positioned = False
+        self.closed = False
+
+    def push(self, event):
+        with self._cond:
+            self.positioned = True
+            if len(self._events) == self._events.maxlen:
+                self._lagged = True  # The oldest event is dropped
+            self._events.append(event)
+            self._cond.notify()
+
+    def mark_lagged(self):
+        with self._cond:
+            self._lagged = True
+            self._cond.notify()
+
+    def get(self, timeout):
+        """
+        Wait up to ``timeout`` seconds for events.
+
+        Returns:
+            tuple: Whether events were dropped since the last call (the client
+            must refetch), and the pending events
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._events or self._lagged or self.closed, timeout)
+            lagged, self._lagged = self._lagged, False
+            events = list(self._events)
+            self._events.clear()
+        return lagged, events
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class EventBroker:
+    """Fans events out to the subscriptions of this process."""
+
+    def __init__(self, buffer_size=100, history_size=1000, max_subscribers=1000):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._history = collections.deque(maxlen=history_size)
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, topics=TOPICS, last_position=None, limit=None) -> Subscription:
+        """
+        Register a subscriber, replaying the events after ``last_position``
+        (see parse_event_id).
+
+        Raises:
+            BrokerFull: If the process already has ``limit`` (default:
+                ``max_subscribers``) subscribers
+        """
+        subscription = Subscription(topics, self.buffer_size)
+        limit = self.max_subscribers if limit is None else min(limit, self.max_subscribers)
+        with self._lock:
+            if len(self._subscriptions) >= limit:
+                raise BrokerFull()
+            if last_position is not None:
+                subscription.positioned = True
+                # Positions are not consecutive: unless the history reaches
+                # back to the client's last event, something may be missing
+                # (e.g. a fresh worker) and the client must refetch
+                if not self._history or self._history[0]['position'] > last_position:
+                    subscription.mark_lagged()
+                for event in self._history:
+                    if event['position'] > last_position and event['topic'] in subscription.topics:
+                        subscription.push(event)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        """Deliver ``event`` ({id, position, topic, action, data, at}) to every subscriber of its topic."""
+        with self._lock:
+            self._history.append(event)
+            self.published += 1
+            subscriptions = [s for s in self._subscriptions if event['topic'] in s.topics]
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def restart(self):
+        """
+        The source skipped ahead (it resumed from the present): forget the
+        history and have the subscribers that had a position refetch, so that
+        no one resumes across the gap. New subscribers just start from here.
+        """
+        with self._lock:
+            self._history.clear()
+            subscriptions = [s for s in self._subscriptions if s.positioned]
+        for subscription in subscriptions:
+            subscription.mark_lagged()
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    @property
+    def last_event_id(self):
+        with self._lock:
+            return format_position(self._history[-1]['position']) if self._history else None
+
+    def stats(self):
+        return {
+            'subscribers': self.subscriber_count,
+            'published': self.published,
+            'last_event_id': self.last_event_id
+        }
+
+
+class LocalChangeSource:
+    """In-process change source: events are published by calling ``publish()``."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._ids = itertools.count(1)
+
+    def ensure_started(self):
+        pass
+
+    def close(self):
+        pass
+
+    def publish(self, topic, action, data):
+        event_id = next(self._ids)
+        event = {
+            'id': event_id, 'position': (event_id,), 'topic': topic, 'action': action, 'data': data,
+            'at': datetime.now(timezone.utc).isoformat()
+        }
+        self.broker.publish(event)
+        return event
+
+
+class PollingChangeSource:
+    """Polls the change_events table while the broker has subscribers."""
+
+    def __init__(self, app, broker, interval=1.0, batch_size=500):
+        self.app = app
+        self.broker = broker
+        self.interval = interval
+        self.batch_size = batch_size
+        self.position = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """Start polling (called when a client subscribes)."""
+        self._wake.set()
+        # Threads do not survive fork, so each worker process starts its own
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='change-poller', daemon=True)
+                self._thread.start()
+
+    def _fetch(self):
+        supabase = get_supabase()
+        if self.position is None:
+            # Start from the present. Events before it cannot be replayed, so
+            # anyone resuming from an earlier position has to refetch
+            horizon = supabase.rpc('change_events_horizon', {}).execute().data
+            self.position = (int(horizon), 0)
+            self.broker.restart()
+            return []
+        # Only finished transactions are read, in (txid, id) order, so an
+        # event committed after a higher id was read is not skipped
+        return supabase.rpc('read_change_events', {
+            'after_txid': str(self.position[0]),
+            'after_id': self.position[1],
+            'page_limit': self.batch_size
+        }).execute().data or []
+
+    def poll(self):
+        """Publish the events recorded since the last poll; returns how many."""
+        rows = self._fetch()
+        for row in rows:
+            position = (int(row['txid']), row['id'])
+            self.broker.publish({
+                'id': row['id'],
+                'position': position,
+                'topic': row['topic'],
+                'action': row['action'],
+                'data': row['payload'],
+                'at': row['created_at']
+            })
+            self.position = position
+        return len(rows)
+
+    def _run(self):
+        failures = 0
+        with self.app.app_context():
+            while not self._stop.is_set():
+                if not self.broker.subscriber_count:
+                    # Nobody listening: stop polling until the next subscriber;
+                    # resume from the present rather than replaying the gap
+                    self._wake.clear()
+                    self._wake.wait(timeout=60)
+                    if not self.broker.subscriber_count:
+                        self.position = None
+                    continue
+                try:
+                    count = self.poll()
+                    failures = 0
+                except Exception:
+                    failures += 1
+                    logger.exception('Polling change_events failed')
+                    count = 0
+                if count < self.batch_size:
+                    # Back off up to 30s while the database is unreachable
+                    self._stop.wait(min(self.interval * 2 ** failures, 30))
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+
+
+def format_position(position) -> str:
+    return '-'.join(str(part) for part in position)
+
+
+def parse_event_id(value):
+    """The position in a ``Last-Event-ID`` header, or None if it is missing or invalid."""
+    try:
+        return tuple(int(part) for part in value.split('-')) if value else None
+    except ValueError:
+        return None
+
+
+def format_event(event) -> str:
+    """Serialize an event in the text/event-stream format."""
+    data = json.dumps({k: event[k] for k in ('action', 'data', 'at')}, ensure_ascii=False, default=str)
+    return f"id: {format_position(event['position'])}\nevent: {event['topic']}\ndata: {data}\n\n"
+
+
+def init_stream(app):
+    """Create the event broker and change source of ``app``."""
+    broker = EventBroker(
+        buffer_size=app.config.get('STREAM_CLIENT_BUFFER', 100),
+        history_size=app.config.get('STREAM_HISTORY', 1000),
+        max_subscribers=app.config.get('STREAM_MAX_SUBSCRIBERS', 1000)
+    )
+    if app.config.get('STREAM_SOURCE', 'poll') == 'local':
+        source = LocalChangeSource(broker)
+    else:
+        source = PollingChangeSource(app, broker, interval=app.config.get('STREAM_POLL_INTERVAL', 1.0))
+    app.extensions['event_broker'] = broker
+    app.extensions['change_source'] = source
+
+
+def get_event_broker() -> EventBroker:
+    """Get the event broker of the current application."""
+    return current_app.extensions['event_broker']
+
+
+def get_change_source():
+    """Get the change source of the current application."""
+    return current_app.extensions['change_source']
@@ -1,28 +1,171 @@
 """
 Supabase client configuration for Flask backend.
+
+Each process gets its own client, created on first use, whose PostgREST
+calls go through one pooled keep-alive ``httpx.Client``. Connections are
+reused across requests and threads, and a client is never shared with a
+forked worker, whose copy of the parent's sockets would be unusable.
 """
+import logging
 import os
-from supabase import create_client, Client
+import threading
+import time
+import httpx
+from flask import current_app
+from postgrest.utils import SyncClient
+from supabase import Client
+from supabase.lib.client_options import ClientOptions
 
-# Get Supabase credentials from environment
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+from app.jwt_verifier import get_token_verifier
+from app.metrics import record_upstream
 
-# Initialize Supabase client
-supabase: Client = create_client(url, key) if url and key else None
+logger = logging.getLogger(__name__)
 
+# Pool settings used until init_supabase() is called with an app's configuration
+DEFAULT_HTTP_SETTINGS = {
+    'pool_size': 20,
+    'keepalive': 20,
+    'keepalive_expiry': 60.0,
+    'http2': False,
+    'timeout': 10.0,
+    'connect_timeout': 5.0
+}
 
-def get_supabase() -> Client:
-    """Get the Supabase client instance."""
-    if supabase is None:
+_settings = dict(DEFAULT_HTTP_SETTINGS)
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+class PooledClient(Client):
+    """Supabase client whose PostgREST requests use a tuned connection pool."""
+
+    def __init__(self, supabase_url, supabase_key, options, http_settings):
+        self.http_settings = http_settings
+        super().__init__(supabase_url, supabase_key, options)
+        # Auth calls (AUTH_VERIFY_MODE=remote) send full URLs and their own headers
+        self.auth._http_client.close()
+        self.auth._http_client = create_http_session('', {}, http_settings)
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout):
+        postgrest = super()._init_postgrest_client(rest_url, headers, schema, timeout)
+        default_session = postgrest.session
+        postgrest.session = create_http_session(
+            default_session.base_url, default_session.headers, self.http_settings
+        )
+        default_session.close()
+        return postgrest
+
+
+class InstrumentedHTTPClient(SyncClient):
+    """
+    ``httpx.Client`` recording the latency and status of every call in app.metrics.
+
+    Based on postgrest's SyncClient, whose ``aclose()`` the PostgREST client
+    calls when it is closed or used as a context manager.
+    """
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            record_upstream(request.method, request.url.path, 'error', time.perf_counter() - started)
+            raise
+        record_upstream(request.method, request.url.path, response.status_code, time.perf_counter() - started)
+        return response
+
+
+def create_http_session(base_url, headers, settings) -> httpx.Client:
+    """Build a keep-alive ``httpx.Client`` from pool/timeout settings."""
+    http2 = settings['http2']
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning('SUPABASE_HTTP2 is enabled but the h2 package is not installed, using HTTP/1.1')
+            http2 = False
+
+    return InstrumentedHTTPClient(
+        base_url=base_url,
+        headers=headers,
+        http2=http2,
+        timeout=httpx.Timeout(settings['timeout'], connect=settings['connect_timeout']),
+        limits=httpx.Limits(
+            max_connections=settings['pool_size'],
+            max_keepalive_connections=settings['keepalive'],
+            keepalive_expiry=settings['keepalive_expiry']
+        )
+    )
+
+
+def create_supabase_client(url=None, key=None, settings=None) -> Client:
+    """
+    Create a Supabase client with a pooled PostgREST session.
+
+    Args:
+        url, key: Defaults to SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY
+        settings: Pool settings, defaults to the ones given to init_supabase()
+    """
+    url = url or os.getenv('SUPABASE_URL')
+    key = key or os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    if not url or not key:
         raise ValueError("Supabase client not initialized. Check SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables.")
-    return supabase
+
+    settings = settings or _settings
+    client = PooledClient(url, key, ClientOptions(postgrest_client_timeout=settings['timeout']), settings)
+    client._auth_token = client._get_token_header()
+    return client
+
+
+def init_supabase(app):
+    """Use the connection pool settings of ``app`` for the clients created from now on."""
+    _settings.update({
+        'pool_size': app.config.get('SUPABASE_HTTP_POOL_SIZE', DEFAULT_HTTP_SETTINGS['pool_size']),
+        'keepalive': app.config.get('SUPABASE_HTTP_KEEPALIVE', DEFAULT_HTTP_SETTINGS['keepalive']),
+        'keepalive_expiry': app.config.get('SUPABASE_HTTP_KEEPALIVE_EXPIRY', DEFAULT_HTTP_SETTINGS['keepalive_expiry']),
+        'http2': app.config.get('SUPABASE_HTTP2', DEFAULT_HTTP_SETTINGS['http2']),
+        'timeout': app.config.get('SUPABASE_HTTP_TIMEOUT', DEFAULT_HTTP_SETTINGS['timeout']),
+        'connect_timeout': app.config.get('SUPABASE_HTTP_CONNECT_TIMEOUT', DEFAULT_HTTP_SETTINGS['connect_timeout'])
+    })
+
+
+def get_supabase() -> Client:
+    """Get the Supabase client of this process, creating it on first use."""
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            set_supabase(create_supabase_client())
+    return _client
+
+
+def set_supabase(client):
+    """Use ``client`` in this process (e.g. an in-process fake for benchmarks)."""
+    global _client, _client_pid
+    _client = client
+    _client_pid = os.getpid()
+
+
+def reset_supabase():
+    """
+    Drop this process's client so the next call creates a new one.
+
+    Called after fork: the inherited client's pooled sockets belong to the
+    parent and are abandoned without being closed.
+    """
+    global _client, _client_pid
+    _client = None
+    _client_pid = None
 
 
 def verify_token(token: str) -> dict:
     """
     Verify a Supabase JWT token and return the user data.
     
+    Tokens are validated locally by default. Setting AUTH_VERIFY_MODE to
+    'remote' falls back to asking Supabase Auth on every call.
+    
     Args:
         token: The JWT token from the Authorization header
         
@@ -33,8 +176,11 @@ def verify_token(token: str) -> dict:
         Exception: If token verification fails
     """
     try:
-        # Get user from Supabase Auth
-        user = supabase.auth.get_user(token)
-        return user.user
+        if current_app.config.get('AUTH_VERIFY_MODE') == 'remote':
+            # Get user from Supabase Auth
+            user = get_supabase().auth.get_user(token)
+            return user.user
+        
+        return get_token_verifier().verify(token)
     except Exception as e:
         raise ValueError(f"Invalid token: {str(e)}")
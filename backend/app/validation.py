@@ -0,0 +1,62 @@
+"""
+Validation of product payloads shared by the single and bulk endpoints.
+"""
+
+PRODUCT_FIELDS = ['name', 'category', 'price_per_kg', 'quantity_available', 'description', 'image_url']
+REQUIRED_PRODUCT_FIELDS = ['name', 'category', 'price_per_kg', 'quantity_available']
+
+# Column lengths from supabase_schema.sql
+MAX_LENGTHS = {'name': 100, 'category': 50, 'image_url': 255}
+
+
+def validate_product(data, partial=False):
+    """
+    Validate and clean a product payload.
+
+    Args:
+        data: The submitted fields
+        partial: True for updates, where every field is optional and the
+            quantity may drop to 0 (sold out)
+
+    Returns:
+        tuple: The cleaned fields and None, or None and an error message
+    """
+    if not isinstance(data, dict):
+        return None, 'Product must be a JSON object'
+
+    if not partial:
+        for field in REQUIRED_PRODUCT_FIELDS:
+            if field not in data:
+                return None, f'Missing required field: {field}'
+
+    product = {k: v for k, v in data.items() if k in PRODUCT_FIELDS}
+    if partial and not product:
+        return None, 'No valid fields to update'
+
+    for field in ('name', 'category'):
+        if field in product and (not isinstance(product[field], str) or not product[field].strip()):
+            return None, f'{field} must be a non-empty string'
+
+    for field, max_length in MAX_LENGTHS.items():
+        value = product.get(field)
+        if value is not None and len(str(value)) > max_length:
+            return None, f'{field} must be at most {max_length} characters'
+
+    # Validate numeric fields
+    try:
+        if 'price_per_kg' in product:
+            product['price_per_kg'] = float(product['price_per_kg'])
+            if product['price_per_kg'] <= 0:
+                return None, 'Price must be greater than 0'
+        if 'quantity_available' in product:
+            product['quantity_available'] = float(product['quantity_available'])
+            if product['quantity_available'] < 0 or (product['quantity_available'] == 0 and not partial):
+                return None, 'Quantity must be greater than 0'
+    except (TypeError, ValueError):
+        return None, 'Price and quantity must be valid numbers'
+
+    if not partial:
+        product.setdefault('description', None)
+        product.setdefault('image_url', None)
+
+    return product, None
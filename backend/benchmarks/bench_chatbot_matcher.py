@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of the chatbot intent/crop matcher.
+
+Compares the per-message cost of the compiled matcher with the previous
+substring scans of get_smart_response, with the shipped lexicon and with a
+lexicon grown to a few hundred crops.
+
+Usage (from backend/):
+    python -m benchmarks.bench_chatbot_matcher [--repeat 20000]
+"""
+import argparse
+import json
+import timeit
+
+from app.chatbot_matcher import DEFAULT_LEXICON_PATH, ChatbotMatcher, matcher
+
+MESSAGES = [
+    "Bonjour, quel est le prix des haricots à Bujumbura?",
+    "Igiciro c'ibiharage ni angahe?",
+    "Avez-vous du maïs disponible cette semaine?",
+    "Ndashaka ibigori",
+    "Combien coûtent les pommes de terre?",
+    "Quelle est la météo demain à Gitega?",
+    "Je voudrais acheter des tomates mais pas trop cher",
+    "Merci beaucoup pour votre aide, à bientôt",
+]
+
+
+LEGACY_CROPS = ['haricot', 'maïs', 'tomate', 'pomme de terre', 'riz', 'oignon', 'carotte',
+                'ibiharage', 'ibigori', 'inyanya', 'ibirayi', 'umuceri']
+
+
+def legacy_match(message, extra_crops=()):
+    """The substring scans get_smart_response used before the compiled matcher."""
+    message_lower = message.lower()
+    crops = LEGACY_CROPS + list(extra_crops)
+    found_crop = next((crop for crop in crops if crop in message_lower), None)
+    if any(word in message_lower for word in ['prix', 'price', 'igiciro', 'coûte', 'gura']):
+        return 'price', found_crop
+    if any(word in message_lower for word in ['avez-vous', 'disponible', 'acheter', 'ntabwo', 'dufise', 'shaka']):
+        return 'availability', found_crop
+    if any(word in message_lower for word in ['météo', 'weather', 'ikirere', 'imvura']):
+        return 'weather', found_crop
+    if any(word in message_lower for word in ['bonjour', 'salut', 'bwakeye', 'bite']):
+        return 'greeting', found_crop
+    return None, found_crop
+
+
+def bench(fn, repeat):
+    total = timeit.timeit(lambda: [fn(m) for m in MESSAGES], number=repeat)
+    return total / (repeat * len(MESSAGES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=20000)
+    parser.add_argument('--extra-crops', type=int, default=300,
+                        help='synthetic crops added for the large-lexicon run')
+    args = parser.parse_args()
+
+    for message in MESSAGES:
+        print(f'{message!r:60} -> {matcher.match(message)}')
+    print()
+    print(f'legacy substring scans: {bench(legacy_match, args.repeat):6.2f} us/message')
+    print(f'compiled matcher:       {bench(matcher.match, args.repeat):6.2f} us/message')
+
+    extra = [f'culture{i:03d}' for i in range(args.extra_crops)]
+    with open(DEFAULT_LEXICON_PATH, encoding='utf-8') as f:
+        lexicon = json.load(f)
+    lexicon['crops'] += [{'name': name} for name in extra]
+    large_matcher = ChatbotMatcher(lexicon)
+    print()
+    print(f'with {args.extra_crops} extra crops:')
+    print(f'legacy substring scans: {bench(lambda m: legacy_match(m, extra), args.repeat):6.2f} us/message')
+    print(f'compiled matcher:       {bench(large_matcher.match, args.repeat):6.2f} us/message')
+
+
+if __name__ == '__main__':
+    main()
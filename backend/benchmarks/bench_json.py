@@ -0,0 +1,108 @@
+"""
+Micro-benchmark of JSON response serialization and compression.
+
+Builds GET /api/products response bodies from products shaped like
+load_test_api's data, once as PostgREST returns them (floats and ISO
+strings) and once with Decimal prices and datetime timestamps, and reports
+the cost per 1,000 products of:
+
+- Flask's default provider (stdlib json, sorted keys, ASCII escapes)
+- FastJSONProvider on stdlib json and, if installed, on orjson
+- gzip and, if installed, brotli compression of the encoded body
+
+Usage (from backend/):
+    python -m benchmarks.bench_json [--products 1000] [--repeat 50]
+"""
+import argparse
+import decimal
+import timeit
+from datetime import datetime
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.compression import available_encodings, compress
+from app.json_provider import FastJSONProvider, orjson
+from benchmarks.load_test_api import generate_data
+
+
+def product_rows(count):
+    """Products as listed by GET /api/products (with the farmer columns)."""
+    data = generate_data(count, 0, max(1, count // 25))
+    users = {user['id']: user for user in data['users']}
+    rows = []
+    for product in data['products']:
+        farmer = users[product['farmer_id']]
+        rows.append({
+            **product,
+            'image_variants': None,
+            'latitude': None,
+            'longitude': None,
+            'farmer_name': farmer['username'],
+            'farmer_phone': farmer['phone'],
+            'farmer_location': farmer['location'],
+        })
+    return rows
+
+
+def typed_rows(rows):
+    """The same rows with DECIMAL(10,2) columns as Decimal and timestamps as datetime."""
+    return [
+        {
+            **row,
+            'price_per_kg': decimal.Decimal(f"{row['price_per_kg']:.2f}"),
+            'quantity_available': decimal.Decimal(f"{row['quantity_available']:.2f}"),
+            'created_at': datetime.fromisoformat(row['created_at']),
+        }
+        for row in rows
+    ]
+
+
+def bench(fn, repeat, per):
+    """Milliseconds per call of ``fn``, scaled to 1,000 products."""
+    fn()
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    return best * 1000 * 1000 / per
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    providers = {'flask default': DefaultJSONProvider(app), 'fast (json)': FastJSONProvider(app, use_orjson=False)}
+    if orjson is not None:
+        providers['fast (orjson)'] = FastJSONProvider(app)
+    else:
+        print('orjson is not installed: only the stdlib backends are measured')
+
+    rows = product_rows(args.products)
+    datasets = {'postgrest': rows, 'typed': typed_rows(rows)}
+
+    print(f'Serialization per 1,000 products ({args.products} products per body, best of {args.repeat})')
+    for dataset, data in datasets.items():
+        body = {'products': data, 'count': len(data), 'next_cursor': None}
+        for name, provider in providers.items():
+            size = len(provider.response(body).get_data())
+            ms = bench(lambda: provider.response(body).get_data(), args.repeat, args.products)
+            print(f'  {dataset:>9} {name:>14}: {ms:7.2f} ms  {size / 1024:8.1f} KiB')
+
+    encoder = providers.get('fast (orjson)', providers['fast (json)'])
+    body = encoder.response({'products': rows, 'count': len(rows), 'next_cursor': None}).get_data()
+    print(f'Compression per 1,000 products ({len(body) / 1024:.1f} KiB body)')
+    settings = [('gzip', {'gzip_level': 1}), ('gzip', {'gzip_level': 6})]
+    if 'br' in available_encodings():
+        settings += [('br', {'brotli_quality': 4}), ('br', {'brotli_quality': 11})]
+    else:
+        print('  brotli is not installed: only gzip is measured')
+    for encoding, options in settings:
+        size = len(compress(body, encoding, **options))
+        ms = bench(lambda: compress(body, encoding, **options), args.repeat, args.products)
+        label = f"{encoding} {next(iter(options.values()))}"
+        print(f'  {label:>9}: {ms:7.2f} ms  {size / 1024:8.1f} KiB  ({size / len(body):.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Throughput of the API under sync, threaded and gevent gunicorn workers.
+
+Each mode runs with gunicorn.conf.py, only the worker class and counts change.
+
+Starts a local stub of the Supabase REST/Auth endpoints that answers after a
+fixed latency, runs the app under gunicorn in each serving mode against it
+and drives a mix of catalogue reads and authenticated product updates from
+concurrent clients. Because the stub only adds latency, the numbers show how
+many requests a worker can keep in flight while waiting on Supabase.
+
+The gevent mode is skipped when gevent is not installed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serving_modes [--workers 2] [--threads 8] \\
+        [--concurrency 50] [--duration 10] [--latency 0.05] [--auth remote]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import jwt
+
+JWT_SECRET = 'bench-secret'
+FARMER_ID = '00000000-0000-4000-8000-000000000001'
+
+FARMER = {
+    'id': FARMER_ID, 'username': 'bench', 'email': 'bench@example.com', 'role': 'farmer',
+    'phone': None, 'location': 'Bujumbura', 'created_at': '2024-01-01T00:00:00+00:00'
+}
+
+PRODUCTS = [
+    {
+        'id': i, 'farmer_id': FARMER_ID, 'name': f'Produit {i}', 'category': 'Légumes',
+        'price_per_kg': 1000, 'quantity_available': 50, 'description': None, 'image_url': None,
+        'created_at': f'2024-01-01T00:00:{i % 60:02d}+00:00',
+        'farmer_name': 'bench', 'farmer_phone': None, 'farmer_location': 'Bujumbura'
+    }
+    for i in range(1, 51)
+]
+
+AUTH_USER = {
+    'id': FARMER_ID, 'aud': 'authenticated', 'role': 'authenticated', 'email': FARMER['email'],
+    'app_metadata': {}, 'user_metadata': {}, 'created_at': '2024-01-01T00:00:00+00:00'
+}
+
+
+def make_stub_handler(latency):
+    class StubSupabase(BaseHTTPRequestHandler):
+        """Minimal PostgREST/GoTrue answering after ``latency`` seconds."""
+
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, body):
+            # postgrest-py also sends a body with GET requests; drain it so
+            # the next request on the keep-alive connection parses cleanly
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            time.sleep(latency)
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path.startswith('/auth/v1/user'):
+                self._reply(AUTH_USER)
+            elif self.path.startswith('/rest/v1/users'):
+                self._reply([FARMER])
+            elif 'id=eq.' in self.path:
+                self._reply(PRODUCTS[:1])
+            else:
+                self._reply(PRODUCTS)
+
+        def do_PATCH(self):
+            self._reply(PRODUCTS[:1])
+
+        do_POST = do_PATCH
+
+    return StubSupabase
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_stub(latency):
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), make_stub_handler(latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_gunicorn(mode, port, stub_url, args):
+    """Run the app with gunicorn.conf.py in the given worker class."""
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=mode,
+        GUNICORN_WORKERS=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        GUNICORN_ACCESS_LOG='',
+        PORT=str(port),
+        SUPABASE_URL=stub_url,
+        SUPABASE_SERVICE_ROLE_KEY='bench.service.key',
+        SUPABASE_JWT_SECRET=JWT_SECRET,
+        AUTH_VERIFY_MODE=args.auth,
+        CACHE_BACKEND='none',
+        FLASK_ENV='production',
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'run:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'gunicorn ({mode}) did not start')
+
+
+def drive(base_url, concurrency, duration):
+    """Send a 3:1 mix of GET /api/products and PUT /api/products/1 for ``duration`` seconds."""
+    token = jwt.encode(
+        {'sub': FARMER_ID, 'aud': 'authenticated', 'exp': int(time.time()) + 3600},
+        JWT_SECRET, algorithm='HS256'
+    )
+    headers = {'Authorization': f'Bearer {token}'}
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client_loop():
+        local, failed = [], 0
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            i = 0
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                if i % 4 == 3:
+                    response = client.put('/api/products/1', json={'price_per_kg': 1000}, headers=headers)
+                else:
+                    response = client.get('/api/products')
+                local.append(time.perf_counter() - started)
+                failed += response.status_code >= 400
+                i += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client_loop) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'errors': errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gthread worker')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help='Stub Supabase latency (seconds)')
+    parser.add_argument('--auth', choices=['local', 'remote'], default='local',
+                        help='remote also verifies every token against the stub (fan-out applies)')
+    parser.add_argument('--modes', default='sync,gthread,gevent')
+    args = parser.parse_args()
+
+    stub = start_stub(args.latency)
+    stub_url = f'http://127.0.0.1:{stub.server_address[1]}'
+
+    print(f'{args.workers} workers, {args.concurrency} clients, {args.duration:g}s, '
+          f'upstream latency {args.latency * 1000:.0f} ms, auth {args.auth}')
+    for mode in args.modes.split(','):
+        if mode == 'gevent':
+            try:
+                import gevent  # noqa: F401
+            except ImportError:
+                print(f'{mode:>8}: skipped (gevent is not installed)')
+                continue
+
+        port = free_port()
+        process = start_gunicorn(mode, port, stub_url, args)
+        try:
+            result = drive(f'http://127.0.0.1:{port}', args.concurrency, args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{mode:>8}: {result['rps']:7.1f} req/s  p50 {result['p50_ms']:6.0f} ms  "
+              f"p99 {result['p99_ms']:6.0f} ms  ({result['requests']} requests, {result['errors']} errors)")
+
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
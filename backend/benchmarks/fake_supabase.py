@@ -0,0 +1,387 @@
+"""
+In-memory stand-in for the subset of the Supabase client the backend uses.
+
+Covers the PostgREST query builder calls made by the routes (select with
+embedded ``alias:table!fk(...)`` relations, filters, raw ``order``/``or``
+params as added by app.pagination, limit/range, single, insert, upsert,
+update, delete) and RPC calls to functions registered in ``rpcs``. Every
+call can be delayed by ``latency`` seconds to model the round-trip to
+Supabase. It is a benchmark fixture, not a database: rows are scanned and
+sorted on every query.
+
+Install it in place of the real client with app.supabase_client.set_supabase.
+"""
+import copy
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+_EMBED_RE = re.compile(r'(\w+):(\w+)!(\w+)\(([^)]*)\)')
+
+# Columns filled in by the database when an insert leaves them out
+DEFAULT_TIMESTAMPS = {
+    'users': 'created_at',
+    'products': 'created_at',
+    'orders': 'created_at',
+    'market_prices': 'date_recorded',
+    'chat_messages': 'timestamp',
+}
+
+
+class APIError(Exception):
+    """Raised where PostgREST would answer with an error."""
+
+
+class Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _sort_key(value):
+    # NULLs last, like PostgreSQL in ascending order
+    return (value is None, value)
+
+
+def _coerce(sample, value):
+    """Convert a filter value from the query string to the type of ``sample``."""
+    if isinstance(sample, bool):
+        return str(value).lower() == 'true'
+    for kind in (int, float):
+        if isinstance(sample, kind) and not isinstance(value, kind):
+            try:
+                return kind(value)
+            except (TypeError, ValueError):
+                return value
+    return value
+
+
+def _like(pattern, flags=0):
+    regex = re.escape(pattern).replace('%', '.*').replace(r'\*', '.*')
+    return re.compile(f'^{regex}$', flags | re.S)
+
+
+_OPS = {
+    'eq': lambda a, b: str(a) == str(b),
+    'neq': lambda a, b: str(a) != str(b),
+    'lt': lambda a, b: a is not None and a < b,
+    'lte': lambda a, b: a is not None and a <= b,
+    'gt': lambda a, b: a is not None and a > b,
+    'gte': lambda a, b: a is not None and a >= b,
+}
+
+
+def _split_top_level(expr):
+    """Split a PostgREST logic expression on the commas outside parentheses and quotes."""
+    parts, depth, current, quoted = [], 0, '', False
+    for ch in expr:
+        if ch == '"':
+            quoted = not quoted
+        elif ch == '(' and not quoted:
+            depth += 1
+        elif ch == ')' and not quoted:
+            depth -= 1
+        if ch == ',' and depth == 0 and not quoted:
+            parts.append(current)
+            current = ''
+        else:
+            current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _parse_logic(kind, expr):
+    """Build a row predicate from ``or=(...)``/``and(...)`` syntax."""
+    predicates = []
+    for part in _split_top_level(expr):
+        part = part.strip()
+        nested = re.match(r'^(and|or)\((.*)\)$', part)
+        if nested:
+            predicates.append(_parse_logic(nested.group(1), nested.group(2)))
+            continue
+        column, op, value = part.split('.', 2)
+        value = value.strip('"')
+        predicates.append(
+            lambda row, column=column, op=op, value=value:
+                _OPS[op](row.get(column), _coerce(row.get(column), value))
+        )
+    combine = any if kind == 'or' else all
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+
+class _Params:
+    """The raw query parameters app.pagination adds (``order`` and ``or``)."""
+
+    def __init__(self, query):
+        self._query = query
+
+    def add(self, key, value):
+        if key == 'order':
+            for part in value.split(','):
+                column, _, direction = part.partition('.')
+                self._query._orders.append((column, direction.startswith('desc')))
+        elif key == 'or':
+            self._query._filters.append(_parse_logic('or', value[1:-1]))
+        else:
+            raise NotImplementedError(f'Query parameter {key!r} is not supported')
+        return self
+
+
+class FakeQuery:
+    """A PostgREST request builder over one in-memory table."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.params = _Params(self)
+        self._op = 'select'
+        self._columns = '*'
+        self._payload = None
+        self._on_conflict = 'id'
+        self._filters = []
+        self._orders = []
+        self._limit = None
+        self._offset = 0
+        self._single = None
+
+    def select(self, columns='*', count=None):
+        if self._op == 'select':
+            self._columns = columns
+        return self
+
+    def insert(self, rows, **kwargs):
+        self._op, self._payload = 'insert', rows
+        return self
+
+    def upsert(self, rows, on_conflict='id', **kwargs):
+        self._op, self._payload, self._on_conflict = 'upsert', rows, on_conflict
+        return self
+
+    def update(self, data, **kwargs):
+        self._op, self._payload = 'update', data
+        return self
+
+    def delete(self, **kwargs):
+        self._op = 'delete'
+        return self
+
+    def _filter(self, predicate):
+        self._filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda row: _OPS['eq'](row.get(column), value))
+
+    def neq(self, column, value):
+        return self._filter(lambda row: _OPS['neq'](row.get(column), value))
+
+    def gt(self, column, value):
+        return self._filter(lambda row: _OPS['gt'](row.get(column), _coerce(row.get(column), value)))
+
+    def gte(self, column, value):
+        return self._filter(lambda row: _OPS['gte'](row.get(column), _coerce(row.get(column), value)))
+
+    def lt(self, column, value):
+        return self._filter(lambda row: _OPS['lt'](row.get(column), _coerce(row.get(column), value)))
+
+    def lte(self, column, value):
+        return self._filter(lambda row: _OPS['lte'](row.get(column), _coerce(row.get(column), value)))
+
+    def in_(self, column, values):
+        values = {str(v) for v in values}
+        return self._filter(lambda row: str(row.get(column)) in values)
+
+    def like(self, column, pattern):
+        regex = _like(pattern)
+        return self._filter(lambda row: row.get(column) is not None and regex.match(str(row[column])))
+
+    def ilike(self, column, pattern):
+        regex = _like(pattern, re.I)
+        return self._filter(lambda row: row.get(column) is not None and regex.match(str(row[column])))
+
+    def or_(self, expr):
+        return self._filter(_parse_logic('or', expr))
+
+    def order(self, column, desc=False, nullsfirst=False):
+        self._orders.append((column, desc))
+        return self
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def range(self, start, end):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def single(self):
+        self._single = 'single'
+        return self
+
+    def maybe_single(self):
+        self._single = 'maybe'
+        return self
+
+    def execute(self):
+        self.db.simulate_round_trip()
+        with self.db.lock:
+            self.db.calls += 1
+            rows = self.db.tables.setdefault(self.table, [])
+            if self._op == 'insert':
+                return Result(self._insert(rows, self._payload))
+            if self._op == 'upsert':
+                return Result(self._upsert(rows, self._payload))
+
+            matched = [row for row in rows if all(f(row) for f in self._filters)]
+            if self._op == 'update':
+                for row in matched:
+                    row.update(copy.deepcopy(self._payload))
+                return Result(copy.deepcopy(matched))
+            if self._op == 'delete':
+                for row in matched:
+                    rows.remove(row)
+                return Result(copy.deepcopy(matched))
+
+            for column, desc in reversed(self._orders):
+                matched.sort(key=lambda row: _sort_key(row.get(column)), reverse=desc)
+            matched = matched[self._offset:]
+            if self._limit is not None:
+                matched = matched[:self._limit]
+            data = [self._project(row) for row in matched]
+
+        if self._single is None:
+            return Result(data)
+        if len(data) == 1:
+            return Result(data[0])
+        if not data and self._single == 'maybe':
+            return Result(None)
+        raise APIError('JSON object requested, multiple (or no) rows returned')
+
+    def _insert(self, rows, payload):
+        inserted = []
+        for item in payload if isinstance(payload, list) else [payload]:
+            row = copy.deepcopy(item)
+            if 'id' not in row:
+                row['id'] = self.db.next_id(self.table)
+            timestamp = DEFAULT_TIMESTAMPS.get(self.table)
+            if timestamp and timestamp not in row:
+                row[timestamp] = datetime.now(timezone.utc).isoformat()
+            rows.append(row)
+            inserted.append(copy.deepcopy(row))
+        return inserted
+
+    def _upsert(self, rows, payload):
+        upserted = []
+        for item in payload if isinstance(payload, list) else [payload]:
+            key = str(item.get(self._on_conflict))
+            existing = next((row for row in rows if str(row.get(self._on_conflict)) == key), None)
+            if existing is None:
+                upserted.extend(self._insert(rows, item))
+            else:
+                existing.update(copy.deepcopy(item))
+                upserted.append(copy.deepcopy(existing))
+        return upserted
+
+    def _project(self, row):
+        embeds = {}
+        for alias, table, foreign_key, columns in _EMBED_RE.findall(self._columns):
+            target = self.db.get_row(table, row.get(foreign_key))
+            names = [c.strip() for c in columns.split(',')]
+            embeds[alias] = {name: target.get(name) for name in names} if target else None
+
+        columns = [c.strip() for c in _EMBED_RE.sub('', self._columns).split(',') if c.strip()]
+        if '*' in columns:
+            projected = copy.deepcopy(row)
+        else:
+            projected = {c: copy.deepcopy(row.get(c)) for c in columns}
+        projected.update(embeds)
+        return projected
+
+
+class FakeRPC:
+    def __init__(self, db, function, params):
+        self.db = db
+        self.function = function
+        self.params = params
+
+    def execute(self):
+        self.db.simulate_round_trip()
+        if self.function not in self.db.rpcs:
+            raise APIError(f'Could not find the function public.{self.function}')
+        with self.db.lock:
+            self.db.calls += 1
+            return Result(self.db.rpcs[self.function](self.db, **self.params))
+
+
+class FakeAuth:
+    """GoTrue is not emulated: use AUTH_VERIFY_MODE=local with locally signed tokens."""
+
+    def get_user(self, token):
+        raise APIError('Remote token verification is not available in the fake')
+
+
+def product_availability(db):
+    """The product_availability() SQL function of supabase_schema.sql."""
+    groups = {}
+    for product in db.tables.get('products', []):
+        if product['quantity_available'] <= 0:
+            continue
+        name = product['name'].lower()
+        group = groups.setdefault(name, {
+            'name': name, 'offers': 0, 'total_kg': 0,
+            'min_price': product['price_per_kg'], 'max_price': product['price_per_kg']
+        })
+        group['offers'] += 1
+        group['total_kg'] += product['quantity_available']
+        group['min_price'] = min(group['min_price'], product['price_per_kg'])
+        group['max_price'] = max(group['max_price'], product['price_per_kg'])
+    return list(groups.values())
+
+
+class FakeSupabase:
+    """In-memory tables and RPC functions behind the supabase-py client interface."""
+
+    def __init__(self, latency=0.0):
+        self.tables = {}
+        self.rpcs = {'product_availability': product_availability}
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.RLock()
+        self.auth = FakeAuth()
+        self._sequences = {}
+        self._indexes = {}
+
+    def simulate_round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def next_id(self, table):
+        self._sequences[table] = self._sequences.get(table, 0) + 1
+        return self._sequences[table]
+
+    def load(self, table, rows):
+        """Replace the rows of ``table`` (integer ids continue after the largest one)."""
+        with self.lock:
+            self.tables[table] = rows
+            self._indexes.pop(table, None)
+            ids = [row['id'] for row in rows if isinstance(row.get('id'), int)]
+            self._sequences[table] = max(ids, default=0)
+
+    def get_row(self, table, row_id):
+        """Look up a row by id, for embedded relations."""
+        rows = self.tables.get(table, [])
+        index = self._indexes.get(table)
+        if index is None or index[0] != len(rows):
+            index = (len(rows), {str(row.get('id')): row for row in rows})
+            self._indexes[table] = index
+        return index[1].get(str(row_id))
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, function, params=None):
+        return FakeRPC(self, function, params or {})
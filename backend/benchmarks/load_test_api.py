@@ -0,0 +1,317 @@
+"""
+Load test of the main read endpoints against an in-memory Supabase.
+
+Seeds benchmarks.fake_supabase with users, products and market prices
+shaped like init_db.py's sample data, at the requested scale, serves the app
+from a separate process (werkzeug, threaded) and drives each scenario in
+turn from ``--concurrency`` clients for ``--duration`` seconds:
+
+    products        GET /api/products (optionally filtered by category)
+    product         GET /api/products/<id>
+    market-prices   GET /api/market-prices (optionally for one crop)
+    chatbot         POST /api/chatbot/ask
+
+and reports throughput and p50/p95/p99 latency per scenario. Each fake
+Supabase call sleeps ``--upstream-latency`` seconds to model the network
+round-trip, so extra calls per request show up in the latencies.
+
+Save the results with ``--output`` and compare a later run against them with
+``--baseline``: the run fails (exit status 1) when a scenario's p95 grew or
+its throughput dropped by more than ``--tolerance``. Compare runs made on
+the same machine with the same options.
+
+Usage (from backend/):
+    python -m benchmarks.load_test_api [--products 5000] [--prices 2000] \\
+        [--concurrency 16] [--duration 10] [--upstream-latency 0.005] \\
+        [--cache none] [--scenarios products,product] \\
+        [--output results.json] [--baseline results.json --tolerance 0.2]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+# The sample data of init_db.py: (name, category, price per kg)
+CROPS = [
+    ('Haricots Rouges', 'Légumes', 1800),
+    ('Maïs', 'Céréales', 1200),
+    ('Tomates', 'Légumes', 800),
+    ('Bananes', 'Fruits', 600),
+    ('Riz', 'Céréales', 1500),
+    ('Manioc', 'Tubercules', 400),
+]
+CATEGORIES = sorted({category for _, category, _ in CROPS})
+MARKET_CROPS = ['Haricots', 'Maïs', 'Tomates', 'Riz', 'Bananes', 'Manioc']
+MARKETS = ['Bujumbura Central', 'Gitega', 'Ngozi', 'Kayanza', 'Rumonge']
+LOCATIONS = ['Bujumbura', 'Gitega', 'Ngozi', 'Kayanza', 'Rumonge']
+
+CHATBOT_MESSAGES = [
+    ('Bonjour, quel est le prix des haricots à Bujumbura?', 'fr'),
+    ("Igiciro c'ibiharage ni angahe?", 'rn'),
+    ('Avez-vous du maïs disponible cette semaine?', 'fr'),
+    ('Ndashaka ibigori', 'rn'),
+    ('Combien coûte le riz?', 'fr'),
+    ('Je voudrais acheter des tomates', 'fr'),
+    ('Merci beaucoup pour votre aide', 'fr'),
+]
+
+
+def generate_data(products, prices, farmers, seed=0):
+    """Build the users, products and market_prices rows."""
+    rng = random.Random(seed)
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+    users = []
+    for i in range(farmers):
+        users.append({
+            'id': f'00000000-0000-4000-8000-{i + 1:012d}', 'username': f'farmer_{i + 1}',
+            'email': f'farmer{i + 1}@farmon.bi', 'role': 'farmer', 'phone': f'+2576{i:07d}',
+            'location': LOCATIONS[i % len(LOCATIONS)], 'created_at': now.isoformat()
+        })
+    users.append({
+        'id': '00000000-0000-4000-9000-000000000001', 'username': 'paul_buyer',
+        'email': 'paul@farmon.bi', 'role': 'buyer', 'phone': '+25761234569',
+        'location': 'Bujumbura', 'created_at': now.isoformat()
+    })
+
+    product_rows = []
+    for i in range(products):
+        name, category, price = rng.choice(CROPS)
+        farmer = users[rng.randrange(farmers)]
+        product_rows.append({
+            'id': i + 1,
+            'farmer_id': farmer['id'],
+            'name': name,
+            'category': category,
+            'price_per_kg': float(round(price * rng.uniform(0.8, 1.2))),
+            'quantity_available': float(rng.choice([0, rng.randint(10, 300)])),
+            'description': f'{name} de qualité',
+            'image_url': None,
+            # Maintained by the set_product_farmer trigger in the database
+            'farmer_name': farmer['username'],
+            'farmer_phone': farmer['phone'],
+            'farmer_location': farmer['location'],
+            'created_at': (now - timedelta(minutes=products - i)).isoformat()
+        })
+
+    price_rows = []
+    for i in range(prices):
+        crop = MARKET_CROPS[i % len(MARKET_CROPS)]
+        base = next((p for n, _, p in CROPS if n.startswith(crop)), 1000)
+        price_rows.append({
+            'id': i + 1,
+            'crop_name': crop,
+            'market_location': rng.choice(MARKETS),
+            'price': float(round(base * rng.uniform(0.85, 1.15))),
+            'date_recorded': (now - timedelta(hours=prices - i)).isoformat()
+        })
+
+    return {'users': users, 'products': product_rows, 'market_prices': price_rows}
+
+
+def serve(port, options):
+    """Child process: seed the fake Supabase and serve the app on ``port``."""
+    # Config reads the environment when it is imported
+    os.environ.update({
+        'SUPABASE_URL': 'http://fake-supabase.invalid',
+        'SUPABASE_SERVICE_ROLE_KEY': 'fake',
+        'SUPABASE_JWT_SECRET': 'fake',
+        'AUTH_VERIFY_MODE': 'local',
+        'CACHE_BACKEND': options['cache'],
+        'LOG_LEVEL': 'WARNING',
+    })
+    import logging
+
+    from werkzeug.serving import make_server
+
+    from app import create_app
+    from app.supabase_client import set_supabase
+    from benchmarks.fake_supabase import FakeSupabase
+
+    fake = FakeSupabase(latency=options['upstream_latency'])
+    data = generate_data(options['products'], options['prices'], options['farmers'])
+    for table, rows in data.items():
+        fake.load(table, rows)
+    set_supabase(fake)
+
+    app = create_app('production')
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # No access log
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise RuntimeError('The API process exited during startup')
+        try:
+            httpx.get(f'{base_url}/', timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError('The API did not start')
+
+
+def make_scenarios(products):
+    """Request factories per scenario: rng -> (method, path, json body)."""
+    return {
+        'products': lambda rng: (
+            'GET', '/api/products' + (f'?category={rng.choice(CATEGORIES)}' if rng.random() < 0.5 else ''), None
+        ),
+        'product': lambda rng: ('GET', f'/api/products/{rng.randint(1, products)}', None),
+        'market-prices': lambda rng: (
+            'GET', '/api/market-prices' + (f'?crop={rng.choice(MARKET_CROPS)}' if rng.random() < 0.5 else ''), None
+        ),
+        'chatbot': lambda rng: (
+            'POST', '/api/chatbot/ask', dict(zip(('message', 'language'), rng.choice(CHATBOT_MESSAGES)))
+        ),
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def drive(base_url, make_request, concurrency, duration, warmup):
+    """Send requests from ``concurrency`` clients; only those after ``warmup`` seconds are measured."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    measure_from = time.monotonic() + warmup
+    stop_at = measure_from + duration
+
+    def client_loop(seed):
+        rng = random.Random(seed)
+        local, failed = [], 0
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            while True:
+                method, path, body = make_request(rng)
+                started = time.monotonic()
+                if started >= stop_at:
+                    break
+                try:
+                    response = client.request(method, path, json=body)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if started >= measure_from:
+                    local.append(time.monotonic() - started)
+                    failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / duration,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """List the scenarios that regressed against ``baseline``."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result['rps'] < before['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['rps']:.1f} -> {result['rps']:.1f} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--prices', type=int, default=2000)
+    parser.add_argument('--farmers', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10, help='Measured seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=2, help='Unmeasured seconds before each scenario')
+    parser.add_argument('--upstream-latency', type=float, default=0.005,
+                        help='Seconds added to every fake Supabase call')
+    parser.add_argument('--cache', choices=['none', 'memory'], default='none',
+                        help='Response cache backend (none measures the handlers themselves)')
+    parser.add_argument('--scenarios', default='products,product,market-prices,chatbot')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Fail on regressions against this results file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed p95 increase / throughput decrease as a fraction')
+    args = parser.parse_args()
+
+    scenarios = make_scenarios(args.products)
+    names = args.scenarios.split(',')
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    options = {
+        'products': args.products, 'prices': args.prices, 'farmers': args.farmers,
+        'upstream_latency': args.upstream_latency, 'cache': args.cache
+    }
+    # Spawned, so the server does not share the load generator's interpreter (and GIL)
+    process = multiprocessing.get_context('spawn').Process(target=serve, args=(port, options), daemon=True)
+    process.start()
+
+    results = {}
+    try:
+        wait_until_up(base_url, process)
+        print(f'{args.products} products, {args.prices} market prices, {args.concurrency} clients, '
+              f'{args.duration:g}s per scenario, upstream latency {args.upstream_latency * 1000:g} ms, '
+              f'cache {args.cache}')
+        for name in names:
+            result = drive(base_url, scenarios[name], args.concurrency, args.duration, args.warmup)
+            results[name] = result
+            print(f"{name:>14}: {result['rps']:7.1f} req/s  p50 {result['p50_ms']:6.1f} ms  "
+                  f"p95 {result['p95_ms']:6.1f} ms  p99 {result['p99_ms']:6.1f} ms  "
+                  f"({result['requests']} requests, {result['errors']} errors)")
+    finally:
+        process.terminate()
+        process.join()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+
+    failed = any(result['errors'] for result in results.values())
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
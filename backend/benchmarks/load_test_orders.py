@@ -0,0 +1,120 @@
+"""
+Load test of order placement: many concurrent buyers ordering the same lot.
+
+Fires ``--requests`` orders at a running API with ``--concurrency`` parallel
+clients, then checks against the database that the lot was not oversold:
+the quantity ordered never exceeds the initial stock, the stock decreased by
+exactly the quantity of the successful orders and one order row exists per
+success. Run it on a product nobody else is ordering during the test.
+
+Needs SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY (for the checks) and buyer
+access tokens (a farmer cannot order their own product).
+
+Usage (from backend/):
+    python -m benchmarks.load_test_orders --base-url http://localhost:5000 \\
+        --product-id 42 --tokens-file buyer_tokens.txt [--concurrency 100] \\
+        [--requests 500] [--quantity 1]
+"""
+import argparse
+import itertools
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.supabase_client import get_supabase
+
+
+def read_stock(product_id):
+    result = get_supabase().table('products').select('quantity_available').eq('id', product_id).execute()
+    return float(result.data[0]['quantity_available'])
+
+
+def count_orders(request_keys):
+    """Count the order rows created with the given idempotency keys."""
+    keys = list(request_keys)
+    total = 0
+    for start in range(0, len(keys), 200):
+        result = get_supabase().table('orders').select('id').in_('request_key', keys[start:start + 200]).execute()
+        total += len(result.data)
+    return total
+
+
+def run(base_url, product_id, tokens, concurrency, requests, quantity):
+    token_cycle = itertools.cycle(tokens)
+    jobs = [(next(token_cycle), str(uuid.uuid4())) for _ in range(requests)]
+
+    def place(job):
+        token, request_key = job
+        started = time.perf_counter()
+        response = client.post(
+            f'{base_url}/api/orders',
+            json={'product_id': product_id, 'quantity': quantity},
+            headers={'Authorization': f'Bearer {token}', 'Idempotency-Key': request_key}
+        )
+        return response.status_code, request_key, time.perf_counter() - started
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    with httpx.Client(limits=limits, timeout=30) as client:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            results = list(pool.map(place, jobs))
+            elapsed = time.perf_counter() - started
+
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--product-id', type=int, required=True)
+    parser.add_argument('--tokens-file', required=True, help='One buyer access token per line')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--quantity', type=float, default=1)
+    args = parser.parse_args()
+
+    with open(args.tokens_file) as f:
+        tokens = [line.strip() for line in f if line.strip()]
+
+    initial = read_stock(args.product_id)
+    results, elapsed = run(args.base_url, args.product_id, tokens, args.concurrency,
+                           args.requests, args.quantity)
+    final = read_stock(args.product_id)
+
+    statuses = Counter(status for status, _, _ in results)
+    placed_keys = [key for status, key, _ in results if status == 201]
+    latencies = sorted(latency for _, _, latency in results)
+    ordered = len(placed_keys) * args.quantity
+    rows = count_orders(placed_keys)
+
+    print(f'{args.requests} requests, concurrency {args.concurrency}: '
+          f'{elapsed:.2f}s ({args.requests / elapsed:.0f} req/s)')
+    print(f'latency p50 {statistics.median(latencies) * 1000:.0f} ms, '
+          f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f} ms')
+    print(f'statuses: {dict(statuses)}')
+    print(f'stock {initial:g} -> {final:g}, ordered {ordered:g} kg in {len(placed_keys)} orders ({rows} rows)')
+
+    failures = []
+    if ordered > initial:
+        failures.append(f'oversold: ordered {ordered:g} kg of {initial:g} kg')
+    if abs((initial - final) - ordered) > 1e-6:
+        failures.append(f'stock decreased by {initial - final:g} kg but {ordered:g} kg were ordered')
+    if rows != len(placed_keys):
+        failures.append(f'{len(placed_keys)} orders accepted but {rows} rows found')
+    if final < 0:
+        failures.append(f'negative stock: {final:g}')
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: no oversell')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,103 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
     
+    # PostgREST HTTP connection pool, one per worker process (timeouts in seconds)
+    # Keep SUPABASE_HTTP_POOL_SIZE at or above the number of threads per worker
+    SUPABASE_HTTP_POOL_SIZE = int(os.getenv('SUPABASE_HTTP_POOL_SIZE', 20))
+    SUPABASE_HTTP_KEEPALIVE = int(os.getenv('SUPABASE_HTTP_KEEPALIVE', 20))
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_HTTP_KEEPALIVE_EXPIRY', 60))
+    SUPABASE_HTTP2 = os.getenv('SUPABASE_HTTP2', 'false').lower() == 'true'  # Requires the h2 package
+    SUPABASE_HTTP_TIMEOUT = float(os.getenv('SUPABASE_HTTP_TIMEOUT', 10))
+    SUPABASE_HTTP_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_HTTP_CONNECT_TIMEOUT', 5))
+    
+    # Auth token verification
+    # 'local' validates JWTs in-process, 'remote' asks Supabase Auth on every request
+    AUTH_VERIFY_MODE = os.getenv('AUTH_VERIFY_MODE', 'local')
+    SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
+    SUPABASE_JWKS_URL = os.getenv('SUPABASE_JWKS_URL')  # Defaults to <SUPABASE_URL>/auth/v1/.well-known/jwks.json
+    SUPABASE_JWT_AUDIENCE = os.getenv('SUPABASE_JWT_AUDIENCE', 'authenticated')
+    SUPABASE_JWT_ISSUER = os.getenv('SUPABASE_JWT_ISSUER')
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 4096))
+    AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 300))
+    AUTH_JWKS_CACHE_TTL = int(os.getenv('AUTH_JWKS_CACHE_TTL', 600))
+    
+    # Cross-request cache of users rows, invalidated on profile updates
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 2048))
+    PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 60))
+    
+    # Response cache for catalogue/price reads: 'memory' (per process), 'redis' or 'none'
+    # With 'memory', writes only invalidate the worker that handled them; others expire after the TTL
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', 30))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+    
+    # Write-behind queue for chatbot messages
+    CHAT_LOG_BATCH_SIZE = int(os.getenv('CHAT_LOG_BATCH_SIZE', 50))
+    CHAT_LOG_FLUSH_INTERVAL = float(os.getenv('CHAT_LOG_FLUSH_INTERVAL', 1.0))
+    CHAT_LOG_MAX_QUEUE = int(os.getenv('CHAT_LOG_MAX_QUEUE', 10000))
+    
+    # In-memory latest market price index used by the chatbot (seconds)
+    PRICE_INDEX_REFRESH_INTERVAL = int(os.getenv('PRICE_INDEX_REFRESH_INTERVAL', 60))
+    PRICE_INDEX_MAX_STALENESS = int(os.getenv('PRICE_INDEX_MAX_STALENESS', 600))
+    
+    # Per-crop availability snapshot used by the chatbot, rebuilt on product writes (seconds)
+    AVAILABILITY_SNAPSHOT_TTL = int(os.getenv('AVAILABILITY_SNAPSHOT_TTL', 60))
+    
+    # Retries of order placement/cancellation on transient database errors (backoff in seconds)
+    ORDER_RETRY_ATTEMPTS = int(os.getenv('ORDER_RETRY_ATTEMPTS', 3))
+    ORDER_RETRY_BACKOFF = float(os.getenv('ORDER_RETRY_BACKOFF', 0.05))
+    
+    # Threads per worker for running independent lookups of a request concurrently
+    # (unused under gevent workers, where lookups run as greenlets)
+    FANOUT_MAX_WORKERS = int(os.getenv('FANOUT_MAX_WORKERS', 8))
+    
+    # Live change feed (GET /api/stream): 'poll' reads the change_events table,
+    # 'local' is an in-process source for tests/development
+    STREAM_SOURCE = os.getenv('STREAM_SOURCE', 'poll')
+    STREAM_POLL_INTERVAL = float(os.getenv('STREAM_POLL_INTERVAL', 1.0))
+    STREAM_CLIENT_BUFFER = int(os.getenv('STREAM_CLIENT_BUFFER', 100))  # Events queued per client before a reset
+    STREAM_HISTORY = int(os.getenv('STREAM_HISTORY', 1000))  # Events replayed to reconnecting clients
+    STREAM_MAX_SUBSCRIBERS = int(os.getenv('STREAM_MAX_SUBSCRIBERS', 1000))  # Per worker process
+    # Per worker without gevent, where each open stream holds one of the GUNICORN_THREADS threads
+    STREAM_THREADED_MAX_SUBSCRIBERS = int(os.getenv('STREAM_THREADED_MAX_SUBSCRIBERS', 2))
+    STREAM_HEARTBEAT_INTERVAL = int(os.getenv('STREAM_HEARTBEAT_INTERVAL', 15))
+    
+    # Product image variants: 'supabase' (IMAGE_BUCKET) or 'local' (IMAGE_LOCAL_DIR, served at /media/)
+    IMAGE_STORAGE_BACKEND = os.getenv('IMAGE_STORAGE_BACKEND', 'supabase')
+    IMAGE_BUCKET = os.getenv('IMAGE_BUCKET', 'product-images')
+    IMAGE_LOCAL_DIR = os.getenv('IMAGE_LOCAL_DIR', '/tmp/farmon-media')
+    IMAGE_WIDTHS = [int(w) for w in os.getenv('IMAGE_WIDTHS', '320,640,1280').split(',')]
+    IMAGE_DEFAULT_WIDTH = int(os.getenv('IMAGE_DEFAULT_WIDTH', 640))  # Width stored as image_url
+    IMAGE_THUMBNAIL_SIZE = int(os.getenv('IMAGE_THUMBNAIL_SIZE', 160))
+    IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', 80))
+    IMAGE_MAX_UPLOAD_BYTES = int(os.getenv('IMAGE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+    IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+    # Images resized at once per worker (bounds memory as well as CPU)
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+    
+    # Request/upstream metrics served at /metrics (per worker process)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    
+    # Per-request profiling: a sampled fraction of requests, plus any request an admin
+    # sends with the X-Profile header; kept in a ring buffer of PROFILE_MAX_FILES files
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILER = os.getenv('PROFILER', 'cprofile')  # 'cprofile' or 'pyinstrument' (optional package)
+    PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/farmon-profiles')
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
+    
+    # JSON responses use orjson when it is installed (false forces the stdlib json module)
+    JSON_USE_ORJSON = os.getenv('JSON_USE_ORJSON', 'true').lower() == 'true'
+    
+    # gzip (and brotli, with the optional 'brotli' package) for responses of COMPRESSION_MIN_SIZE bytes or more
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+    COMPRESSION_CACHE_SIZE = int(os.getenv('COMPRESSION_CACHE_SIZE', 256))  # Compressed bodies kept per worker
+    
     # CORS Configuration
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(',')
 
@@ -0,0 +1,63 @@
+"""
+Gunicorn configuration, driven by environment variables.
+
+    gunicorn -c gunicorn.conf.py run:app
+
+Workers default to one per CPU core with threads (gthread); with
+GUNICORN_WORKER_CLASS=gevent each worker serves GUNICORN_WORKER_CONNECTIONS
+requests cooperatively instead. The app is loaded once in the master
+(preload) and per-process state that must not cross fork, such as the
+Supabase connection pool, is re-created in each worker.
+"""
+import multiprocessing
+import os
+
+
+def _int(name, default):
+    return int(os.getenv(name, default))
+
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+if worker_class == 'gevent' and preload_app:
+    # The app is imported by the master before the gevent worker would
+    # patch, so patch first or its sockets stay blocking
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+_cpus = multiprocessing.cpu_count()
+# Threaded and gevent workers overlap I/O themselves, so one per core is enough;
+# plain sync workers only serve one request each
+workers = _int('GUNICORN_WORKERS', _cpus if worker_class in ('gthread', 'gevent') else 2 * _cpus + 1)
+threads = _int('GUNICORN_THREADS', 8)
+worker_connections = _int('GUNICORN_WORKER_CONNECTIONS', 1000)
+
+# Recycle workers now and then to bound memory growth; the jitter keeps
+# them from all restarting at the same moment
+max_requests = _int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = _int('GUNICORN_MAX_REQUESTS_JITTER', 200)
+
+timeout = _int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _int('GUNICORN_KEEPALIVE', 5)
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None  # Empty disables it
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Drop the Supabase client inherited from the master; the worker creates its own."""
+    from app.supabase_client import reset_supabase
+    reset_supabase()
+
+
+def worker_exit(server, worker):
+    """Write the chat messages still queued before the worker goes away."""
+    app = getattr(worker, 'wsgi', None)
+    chat_log = getattr(app, 'extensions', {}).get('chat_log')
+    if chat_log is not None:
+        chat_log.close()
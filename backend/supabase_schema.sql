@@ -15,6 +15,16 @@ CREATE TABLE IF NOT EXISTS public.users (
   created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Trigram matching for typo-tolerant product search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+-- Geography points and distance queries (GET /api/products?near=)
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+-- Coordinates of the user's location; filled in from public.communes when
+-- location names a known commune (see set_user_coordinates)
+ALTER TABLE public.users ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE public.users ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+
 -- ============================================
 -- PRODUCTS TABLE
 -- Marketplace product listings
@@ -31,6 +41,36 @@ CREATE TABLE IF NOT EXISTS public.products (
   created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Where the product is, by default its farmer's coordinates (see
+-- set_product_coordinates); geo is the indexed point used by products_near
+ALTER TABLE public.products ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE public.products ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+ALTER TABLE public.products ADD COLUMN IF NOT EXISTS geo geography(Point, 4326)
+  GENERATED ALWAYS AS (
+    CASE WHEN latitude IS NOT NULL AND longitude IS NOT NULL
+         THEN ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography
+    END
+  ) STORED;
+
+-- Resized variants of an uploaded photo (POST /api/products/<id>/image):
+-- {src, srcset, widths: {width: url}, thumbnail, width, height, hash}
+ALTER TABLE public.products ADD COLUMN IF NOT EXISTS image_variants JSONB;
+
+-- Copy of the farmer's profile, kept in sync by set_product_farmer and
+-- sync_farmer_products so product listings read a single table
+ALTER TABLE public.products ADD COLUMN IF NOT EXISTS farmer_name VARCHAR(80);
+ALTER TABLE public.products ADD COLUMN IF NOT EXISTS farmer_phone VARCHAR(20);
+ALTER TABLE public.products ADD COLUMN IF NOT EXISTS farmer_location VARCHAR(100);
+
+-- Full-text search document (GET /api/products/search); the french
+-- configuration stems plurals so "haricots" matches "haricot"
+ALTER TABLE public.products ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('french', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('french', coalesce(category, '')), 'B') ||
+    setweight(to_tsvector('french', coalesce(description, '')), 'C')
+  ) STORED;
+
 -- ============================================
 -- MARKET PRICES TABLE
 -- Track crop prices at different markets
@@ -43,6 +83,16 @@ CREATE TABLE IF NOT EXISTS public.market_prices (
   date_recorded TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- ============================================
+-- COMMUNES TABLE
+-- Coordinates of the place names used in users.location (lower case)
+-- ============================================
+CREATE TABLE IF NOT EXISTS public.communes (
+  name VARCHAR(100) PRIMARY KEY,
+  latitude DOUBLE PRECISION NOT NULL,
+  longitude DOUBLE PRECISION NOT NULL
+);
+
 -- ============================================
 -- CHAT MESSAGES TABLE
 -- Store chatbot conversation history
@@ -55,6 +105,41 @@ CREATE TABLE IF NOT EXISTS public.chat_messages (
   timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- ============================================
+-- ORDERS TABLE
+-- Purchases of product lots; stock is reserved when the order is placed
+-- ============================================
+CREATE TABLE IF NOT EXISTS public.orders (
+  id SERIAL PRIMARY KEY,
+  product_id INTEGER REFERENCES public.products(id) ON DELETE SET NULL,
+  buyer_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+  farmer_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+  quantity_kg DECIMAL(10,2) NOT NULL CHECK (quantity_kg > 0),
+  price_per_kg DECIMAL(10,2) NOT NULL,
+  total_price DECIMAL(12,2) NOT NULL,
+  status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'cancelled')),
+  -- Idempotency key, so a retried request never reserves stock twice
+  request_key UUID UNIQUE NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- ============================================
+-- CHANGE EVENTS TABLE
+-- Feed of market price and product changes, written by triggers and
+-- polled by the API for GET /api/stream
+-- ============================================
+CREATE TABLE IF NOT EXISTS public.change_events (
+  id BIGSERIAL PRIMARY KEY,
+  topic VARCHAR(20) NOT NULL CHECK (topic IN ('market_prices', 'products')),
+  action VARCHAR(20) NOT NULL CHECK (action IN ('created', 'updated', 'deleted', 'stock')),
+  payload JSONB NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Transaction that recorded the event: the feed is read in (txid, id) order,
+-- one finished transaction at a time (see read_change_events)
+ALTER TABLE public.change_events ADD COLUMN IF NOT EXISTS txid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
 -- ============================================
 -- ENABLE ROW LEVEL SECURITY (RLS)
 -- ============================================
@@ -62,6 +147,10 @@ ALTER TABLE public.users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.products ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.market_prices ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.chat_messages ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.orders ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.communes ENABLE ROW LEVEL SECURITY;
+-- No policies: only read by the API with the service role key
+ALTER TABLE public.change_events ENABLE ROW LEVEL SECURITY;
 
 -- ============================================
 -- RLS POLICIES FOR USERS
@@ -107,6 +196,10 @@ CREATE POLICY "Anyone can view market prices" ON public.market_prices
 -- Only admins can insert/update market prices (via service role key)
 -- The service role key bypasses RLS, so no INSERT/UPDATE policy needed for regular users
 
+-- Anyone can read the commune coordinates
+CREATE POLICY "Anyone can view communes" ON public.communes
+  FOR SELECT USING (true);
+
 -- ============================================
 -- RLS POLICIES FOR CHAT MESSAGES
 -- ============================================
@@ -118,16 +211,591 @@ CREATE POLICY "Users can view own messages" ON public.chat_messages
 CREATE POLICY "Users can insert messages" ON public.chat_messages
   FOR INSERT WITH CHECK (auth.uid() = user_id OR user_id IS NULL);
 
+-- ============================================
+-- RLS POLICIES FOR ORDERS
+-- ============================================
+-- Buyers and farmers can view the orders they are part of
+-- Orders are only written through place_order/cancel_order (service role key)
+CREATE POLICY "Users can view own orders" ON public.orders
+  FOR SELECT USING (auth.uid() = buyer_id OR auth.uid() = farmer_id);
+
 -- ============================================
 -- CREATE INDEXES FOR PERFORMANCE
 -- ============================================
 CREATE INDEX IF NOT EXISTS idx_products_farmer_id ON public.products(farmer_id);
 CREATE INDEX IF NOT EXISTS idx_products_category ON public.products(category);
 CREATE INDEX IF NOT EXISTS idx_products_created_at ON public.products(created_at DESC);
+-- Keyset pagination of GET /api/products orders by (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_products_created_at_id ON public.products(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_products_search_vector ON public.products USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON public.products USING GIN (name gin_trgm_ops);
+-- Radius filter of products_near
+CREATE INDEX IF NOT EXISTS idx_products_geo ON public.products USING GIST (geo);
 CREATE INDEX IF NOT EXISTS idx_market_prices_crop ON public.market_prices(crop_name);
 CREATE INDEX IF NOT EXISTS idx_market_prices_date ON public.market_prices(date_recorded DESC);
+-- Keyset pagination of the price index refresh and /api/export/market-prices
+CREATE INDEX IF NOT EXISTS idx_market_prices_date_id ON public.market_prices(date_recorded, id);
+-- Latest/previous price per (crop, market) for market_price_summary
+CREATE INDEX IF NOT EXISTS idx_market_prices_crop_market_date
+  ON public.market_prices(crop_name, market_location, date_recorded DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_user ON public.chat_messages(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_timestamp ON public.chat_messages(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_buyer ON public.orders(buyer_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_farmer ON public.orders(farmer_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_change_events_created_at ON public.change_events(created_at);
+CREATE INDEX IF NOT EXISTS idx_change_events_txid_id ON public.change_events(txid, id);
+
+-- ============================================
+-- FUNCTIONS
+-- ============================================
+-- In-stock products aggregated by name (chatbot availability snapshot)
+CREATE OR REPLACE FUNCTION public.product_availability()
+RETURNS TABLE (name TEXT, offers BIGINT, total_kg NUMERIC, min_price NUMERIC, max_price NUMERIC)
+LANGUAGE sql STABLE AS $$
+  SELECT lower(p.name), count(*), sum(p.quantity_available), min(p.price_per_kg), max(p.price_per_kg)
+  FROM public.products p
+  WHERE p.quantity_available > 0
+  GROUP BY lower(p.name);
+$$;
+
+-- Per crop and market: latest and previous price, percentage change and
+-- min/avg/max buckets ('day' or 'week') over the last window_days
+-- (GET /api/market-prices/summary)
+CREATE OR REPLACE FUNCTION public.market_price_summary(
+  window_days INTEGER DEFAULT 30,
+  bucket_size TEXT DEFAULT 'day',
+  crop TEXT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE sql STABLE AS $$
+  WITH ranked AS (
+    SELECT crop_name, market_location, price, date_recorded,
+           row_number() OVER (
+             PARTITION BY crop_name, market_location
+             ORDER BY date_recorded DESC, id DESC
+           ) AS rn
+    FROM public.market_prices
+    WHERE crop IS NULL OR crop_name = crop
+  ),
+  latest AS (
+    SELECT crop_name, market_location,
+           max(price) FILTER (WHERE rn = 1) AS latest_price,
+           max(date_recorded) FILTER (WHERE rn = 1) AS latest_date,
+           max(price) FILTER (WHERE rn = 2) AS previous_price
+    FROM ranked
+    WHERE rn <= 2
+    GROUP BY crop_name, market_location
+  ),
+  buckets AS (
+    SELECT crop_name, market_location,
+           date_trunc(bucket_size, date_recorded) AS bucket_start,
+           min(price) AS min_price,
+           round(avg(price), 2) AS avg_price,
+           max(price) AS max_price,
+           count(*) AS samples
+    FROM public.market_prices
+    WHERE date_recorded >= now() - make_interval(days => window_days)
+      AND (crop IS NULL OR crop_name = crop)
+    GROUP BY 1, 2, 3
+  )
+  SELECT coalesce(jsonb_agg(jsonb_build_object(
+           'crop_name', l.crop_name,
+           'market_location', l.market_location,
+           'latest_price', l.latest_price,
+           'latest_date', l.latest_date,
+           'previous_price', l.previous_price,
+           'change_pct', CASE WHEN l.previous_price > 0
+                              THEN round((l.latest_price - l.previous_price) / l.previous_price * 100, 2)
+                         END,
+           'buckets', coalesce((
+             SELECT jsonb_agg(jsonb_build_object(
+                      'start', b.bucket_start,
+                      'min', b.min_price,
+                      'avg', b.avg_price,
+                      'max', b.max_price,
+                      'samples', b.samples
+                    ) ORDER BY b.bucket_start)
+             FROM buckets b
+             WHERE b.crop_name = l.crop_name AND b.market_location = l.market_location
+           ), '[]'::jsonb)
+         ) ORDER BY l.crop_name, l.market_location), '[]'::jsonb)
+  FROM latest l;
+$$;
+
+-- Ranked product search: full-text match on the french search_vector or
+-- trigram word similarity on the name (typos). synonyms is an optional
+-- extra query OR-ed in (e.g. "haricot" for "ibiharage").
+-- (GET /api/products/search)
+-- Dropped first: CREATE OR REPLACE cannot change the returned columns
+DROP FUNCTION IF EXISTS public.search_products(TEXT, TEXT, INTEGER, INTEGER);
+CREATE OR REPLACE FUNCTION public.search_products(
+  q TEXT,
+  synonyms TEXT DEFAULT NULL,
+  page_limit INTEGER DEFAULT 20,
+  page_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+  id INTEGER,
+  farmer_id UUID,
+  name VARCHAR,
+  category VARCHAR,
+  price_per_kg NUMERIC,
+  quantity_available NUMERIC,
+  description TEXT,
+  image_url VARCHAR,
+  image_variants JSONB,
+  created_at TIMESTAMP WITH TIME ZONE,
+  farmer_name VARCHAR,
+  farmer_phone VARCHAR,
+  farmer_location VARCHAR,
+  rank REAL
+)
+LANGUAGE sql STABLE AS $$
+  WITH query AS (
+    SELECT websearch_to_tsquery('french', q)
+           || coalesce(websearch_to_tsquery('french', synonyms), ''::tsquery) AS ts
+  ),
+  matches AS (
+    SELECT p.*,
+           ts_rank(p.search_vector, query.ts)
+           + greatest(word_similarity(q, p.name), word_similarity(coalesce(synonyms, ''), p.name)) AS score
+    FROM public.products p, query
+    WHERE p.search_vector @@ query.ts
+       OR q <% p.name
+       OR (synonyms IS NOT NULL AND synonyms <% p.name)
+  )
+  SELECT m.id, m.farmer_id, m.name, m.category, m.price_per_kg, m.quantity_available,
+         m.description, m.image_url, m.image_variants, m.created_at,
+         m.farmer_name, m.farmer_phone, m.farmer_location,
+         m.score::REAL
+  FROM matches m
+  ORDER BY m.score DESC, m.id
+  LIMIT page_limit OFFSET page_offset;
+$$;
+
+-- Multi-row partial update of one farmer's products: updates is a JSON array
+-- of objects with an id and the fields to change. Fields absent from an object
+-- keep their current value, so concurrent stock changes are not overwritten.
+-- Returns the ids that were updated. (PATCH /api/products/bulk)
+CREATE OR REPLACE FUNCTION public.bulk_update_products(owner UUID, updates JSONB)
+RETURNS SETOF INTEGER
+LANGUAGE sql AS $$
+  UPDATE public.products p SET
+    name = CASE WHEN u.patch ? 'name' THEN u.patch->>'name' ELSE p.name END,
+    category = CASE WHEN u.patch ? 'category' THEN u.patch->>'category' ELSE p.category END,
+    price_per_kg = CASE WHEN u.patch ? 'price_per_kg'
+                        THEN (u.patch->>'price_per_kg')::NUMERIC ELSE p.price_per_kg END,
+    quantity_available = CASE WHEN u.patch ? 'quantity_available'
+                              THEN (u.patch->>'quantity_available')::NUMERIC ELSE p.quantity_available END,
+    description = CASE WHEN u.patch ? 'description' THEN u.patch->>'description' ELSE p.description END,
+    image_url = CASE WHEN u.patch ? 'image_url' THEN u.patch->>'image_url' ELSE p.image_url END,
+    image_variants = CASE WHEN u.patch ? 'image_url' THEN NULL ELSE p.image_variants END
+  FROM jsonb_array_elements(updates) AS u(patch)
+  WHERE p.id = (u.patch->>'id')::INTEGER AND p.farmer_id = owner
+  RETURNING p.id;
+$$;
+
+-- Place an order and reserve its stock in one statement. The conditional
+-- UPDATE only succeeds while quantity_available >= p_quantity; concurrent
+-- buyers of the same lot queue on its row lock for the duration of that
+-- statement only and re-check the condition, so stock never goes negative.
+-- Returns no row when the product is missing, owned by the buyer or out of
+-- stock, and the existing order when the buyer already used p_request_key
+-- for the same product and quantity. A key used by another buyer raises
+-- PT409, one reused for a different product or quantity raises PT422.
+-- (POST /api/orders)
+CREATE OR REPLACE FUNCTION public.place_order(
+  p_buyer UUID,
+  p_product INTEGER,
+  p_quantity NUMERIC,
+  p_request_key UUID
+)
+RETURNS SETOF public.orders
+LANGUAGE plpgsql AS $$
+DECLARE
+  existing public.orders;
+BEGIN
+  SELECT * INTO existing FROM public.orders o WHERE o.request_key = p_request_key;
+  IF FOUND THEN
+    IF existing.buyer_id <> p_buyer THEN
+      RAISE EXCEPTION 'Idempotency key already used' USING ERRCODE = 'PT409';
+    END IF;
+    IF existing.product_id <> p_product OR existing.quantity_kg <> p_quantity THEN
+      RAISE EXCEPTION 'Idempotency key already used for a different order' USING ERRCODE = 'PT422';
+    END IF;
+    RETURN NEXT existing;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  WITH reserved AS (
+    UPDATE public.products p
+    SET quantity_available = p.quantity_available - p_quantity
+    WHERE p.id = p_product
+      AND p.farmer_id <> p_buyer
+      AND p.quantity_available >= p_quantity
+    RETURNING p.id, p.farmer_id, p.price_per_kg
+  )
+  INSERT INTO public.orders (product_id, buyer_id, farmer_id, quantity_kg, price_per_kg, total_price, request_key)
+  SELECT r.id, p_buyer, r.farmer_id, p_quantity, r.price_per_kg, round(r.price_per_kg * p_quantity, 2), p_request_key
+  FROM reserved r
+  RETURNING *;
+END;
+$$;
+
+-- Cancel a pending order (buyer or farmer) and return its quantity to the
+-- product, in one statement. Returns no row if the order cannot be cancelled.
+-- (POST /api/orders/<id>/cancel)
+CREATE OR REPLACE FUNCTION public.cancel_order(p_order INTEGER, p_user UUID)
+RETURNS SETOF public.orders
+LANGUAGE sql AS $$
+  WITH cancelled AS (
+    UPDATE public.orders o
+    SET status = 'cancelled'
+    WHERE o.id = p_order
+      AND o.status = 'pending'
+      AND (o.buyer_id = p_user OR o.farmer_id = p_user)
+    RETURNING o.*
+  ),
+  restored AS (
+    UPDATE public.products p
+    SET quantity_available = p.quantity_available + c.quantity_kg
+    FROM cancelled c
+    WHERE p.id = c.product_id
+  )
+  SELECT * FROM cancelled;
+$$;
+
+-- Look up the coordinates of a user's location when it changes, unless the
+-- same update sets them explicitly. Unknown places clear them.
+CREATE OR REPLACE FUNCTION public.set_user_coordinates()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP = 'UPDATE' AND (
+       NEW.location IS NOT DISTINCT FROM OLD.location
+       OR NEW.latitude IS DISTINCT FROM OLD.latitude
+       OR NEW.longitude IS DISTINCT FROM OLD.longitude) THEN
+    RETURN NEW;
+  END IF;
+  IF TG_OP = 'INSERT' AND NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL THEN
+    RETURN NEW;
+  END IF;
+
+  SELECT c.latitude, c.longitude INTO NEW.latitude, NEW.longitude
+  FROM public.communes c
+  WHERE c.name = lower(trim(NEW.location));
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS users_set_coordinates ON public.users;
+CREATE TRIGGER users_set_coordinates
+  BEFORE INSERT OR UPDATE OF location, latitude, longitude ON public.users
+  FOR EACH ROW EXECUTE FUNCTION public.set_user_coordinates();
+
+-- New products without coordinates are placed at their farmer's location
+CREATE OR REPLACE FUNCTION public.set_product_coordinates()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF NEW.latitude IS NULL OR NEW.longitude IS NULL THEN
+    SELECT u.latitude, u.longitude INTO NEW.latitude, NEW.longitude
+    FROM public.users u
+    WHERE u.id = NEW.farmer_id;
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS products_set_coordinates ON public.products;
+CREATE TRIGGER products_set_coordinates
+  BEFORE INSERT ON public.products
+  FOR EACH ROW EXECUTE FUNCTION public.set_product_coordinates();
+
+-- When a farmer moves, move the products still at their previous coordinates
+CREATE OR REPLACE FUNCTION public.move_farmer_products()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  UPDATE public.products p
+  SET latitude = NEW.latitude, longitude = NEW.longitude
+  WHERE p.farmer_id = NEW.id
+    AND p.latitude IS NOT DISTINCT FROM OLD.latitude
+    AND p.longitude IS NOT DISTINCT FROM OLD.longitude;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS users_move_products ON public.users;
+CREATE TRIGGER users_move_products
+  AFTER UPDATE OF latitude, longitude ON public.users
+  FOR EACH ROW
+  WHEN (OLD.latitude IS DISTINCT FROM NEW.latitude OR OLD.longitude IS DISTINCT FROM NEW.longitude)
+  EXECUTE FUNCTION public.move_farmer_products();
+
+-- Variants of a previous upload no longer match a new image_url, however the
+-- row is updated (the API, bulk updates or the frontend's own client). An
+-- upload sets both columns in one statement and keeps its new variants.
+CREATE OR REPLACE FUNCTION public.clear_product_image_variants()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF NEW.image_variants IS NOT DISTINCT FROM OLD.image_variants THEN
+    NEW.image_variants := NULL;
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS products_clear_image_variants ON public.products;
+CREATE TRIGGER products_clear_image_variants
+  BEFORE UPDATE OF image_url ON public.products
+  FOR EACH ROW
+  WHEN (OLD.image_url IS DISTINCT FROM NEW.image_url)
+  EXECUTE FUNCTION public.clear_product_image_variants();
+
+-- Products carry their farmer's name, phone and location (set here, whatever
+-- the client sent)
+CREATE OR REPLACE FUNCTION public.set_product_farmer()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  SELECT u.username, u.phone, u.location
+  INTO NEW.farmer_name, NEW.farmer_phone, NEW.farmer_location
+  FROM public.users u
+  WHERE u.id = NEW.farmer_id;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS products_set_farmer ON public.products;
+CREATE TRIGGER products_set_farmer
+  BEFORE INSERT OR UPDATE OF farmer_id, farmer_name, farmer_phone, farmer_location ON public.products
+  FOR EACH ROW EXECUTE FUNCTION public.set_product_farmer();
+
+-- When a farmer edits their profile, update the copy on their products
+CREATE OR REPLACE FUNCTION public.sync_farmer_products()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  UPDATE public.products p
+  SET farmer_name = NEW.username, farmer_phone = NEW.phone, farmer_location = NEW.location
+  WHERE p.farmer_id = NEW.id;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS users_sync_products ON public.users;
+CREATE TRIGGER users_sync_products
+  AFTER UPDATE OF username, phone, location ON public.users
+  FOR EACH ROW
+  WHEN (OLD.username IS DISTINCT FROM NEW.username
+        OR OLD.phone IS DISTINCT FROM NEW.phone
+        OR OLD.location IS DISTINCT FROM NEW.location)
+  EXECUTE FUNCTION public.sync_farmer_products();
+
+-- Products within radius_km of (lat, lon), nearest first, with the same
+-- filters as GET /api/products. ST_DWithin uses idx_products_geo; pages are
+-- keyed on (distance_m, id): pass the last row's values to get the next one.
+-- (GET /api/products?near=)
+CREATE OR REPLACE FUNCTION public.products_near(
+  lat DOUBLE PRECISION,
+  lon DOUBLE PRECISION,
+  radius_km DOUBLE PRECISION,
+  category_filter TEXT DEFAULT NULL,
+  min_price NUMERIC DEFAULT NULL,
+  max_price NUMERIC DEFAULT NULL,
+  page_limit INTEGER DEFAULT 50,
+  after_distance DOUBLE PRECISION DEFAULT NULL,
+  after_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+  id INTEGER,
+  farmer_id UUID,
+  name VARCHAR,
+  category VARCHAR,
+  price_per_kg NUMERIC,
+  quantity_available NUMERIC,
+  description TEXT,
+  image_url VARCHAR,
+  image_variants JSONB,
+  latitude DOUBLE PRECISION,
+  longitude DOUBLE PRECISION,
+  created_at TIMESTAMP WITH TIME ZONE,
+  farmer_name VARCHAR,
+  farmer_phone VARCHAR,
+  farmer_location VARCHAR,
+  distance_m DOUBLE PRECISION
+)
+LANGUAGE sql STABLE AS $$
+  WITH origin AS (
+    SELECT ST_SetSRID(ST_MakePoint(lon, lat), 4326)::geography AS point
+  ),
+  nearby AS (
+    SELECT p.*, ST_Distance(p.geo, origin.point) AS distance
+    FROM public.products p, origin
+    WHERE ST_DWithin(p.geo, origin.point, radius_km * 1000)
+      AND (category_filter IS NULL OR p.category = category_filter)
+      AND (min_price IS NULL OR p.price_per_kg >= min_price)
+      AND (max_price IS NULL OR p.price_per_kg <= max_price)
+  )
+  SELECT n.id, n.farmer_id, n.name, n.category, n.price_per_kg, n.quantity_available,
+         n.description, n.image_url, n.image_variants, n.latitude, n.longitude, n.created_at,
+         n.farmer_name, n.farmer_phone, n.farmer_location,
+         n.distance
+  FROM nearby n
+  WHERE after_distance IS NULL OR (n.distance, n.id) > (after_distance, after_id)
+  ORDER BY n.distance, n.id
+  LIMIT page_limit;
+$$;
+
+-- Record new market prices in the change feed
+CREATE OR REPLACE FUNCTION public.record_market_price_event()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO public.change_events (topic, action, payload)
+  VALUES ('market_prices', 'created', to_jsonb(NEW));
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS market_prices_change_event ON public.market_prices;
+CREATE TRIGGER market_prices_change_event
+  AFTER INSERT ON public.market_prices
+  FOR EACH ROW EXECUTE FUNCTION public.record_market_price_event();
+
+-- Record product writes in the change feed. Updates that only change the
+-- stock (orders, cancellations) are sent as a small 'stock' event.
+CREATE OR REPLACE FUNCTION public.record_product_event()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+  old_row JSONB;
+  new_row JSONB;
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    INSERT INTO public.change_events (topic, action, payload)
+    VALUES ('products', 'deleted', jsonb_build_object('id', OLD.id, 'farmer_id', OLD.farmer_id));
+    RETURN NULL;
+  END IF;
+
+  new_row := to_jsonb(NEW) - 'search_vector' - 'geo';
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO public.change_events (topic, action, payload) VALUES ('products', 'created', new_row);
+    RETURN NULL;
+  END IF;
+
+  old_row := to_jsonb(OLD) - 'search_vector' - 'geo';
+  IF new_row = old_row THEN
+    RETURN NULL;
+  ELSIF new_row - 'quantity_available' = old_row - 'quantity_available' THEN
+    INSERT INTO public.change_events (topic, action, payload)
+    VALUES ('products', 'stock', jsonb_build_object('id', NEW.id, 'quantity_available', NEW.quantity_available));
+  ELSE
+    INSERT INTO public.change_events (topic, action, payload) VALUES ('products', 'updated', new_row);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS products_change_event ON public.products;
+CREATE TRIGGER products_change_event
+  AFTER INSERT OR UPDATE OR DELETE ON public.products
+  FOR EACH ROW EXECUTE FUNCTION public.record_product_event();
+
+-- Delete change events older than keep_for; the API only replays recent
+-- ones. Schedule it, e.g. with pg_cron:
+--   SELECT cron.schedule('prune-change-events', '0 * * * *', 'SELECT public.prune_change_events()');
+CREATE OR REPLACE FUNCTION public.prune_change_events(keep_for INTERVAL DEFAULT '1 day')
+RETURNS INTEGER
+LANGUAGE sql AS $$
+  WITH deleted AS (
+    DELETE FROM public.change_events WHERE created_at < NOW() - keep_for RETURNING 1
+  )
+  SELECT count(*)::INTEGER FROM deleted;
+$$;
+
+-- Change events after position (after_txid, after_id), in (txid, id) order.
+-- Ids are taken at insert time, so a transaction that commits late (a bulk
+-- write, or all of a farmer's products updated at once) can add ids below
+-- ones already read. Only transactions older than the snapshot's xmin are
+-- read: they have all ended, so nothing can appear before the returned
+-- rows any more. A long-running transaction delays events, it never drops
+-- them. (GET /api/stream)
+CREATE OR REPLACE FUNCTION public.read_change_events(
+  after_txid TEXT,
+  after_id BIGINT,
+  page_limit INTEGER DEFAULT 500
+)
+RETURNS TABLE (
+  txid TEXT,
+  id BIGINT,
+  topic VARCHAR,
+  action VARCHAR,
+  payload JSONB,
+  created_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE sql STABLE AS $$
+  SELECT e.txid::TEXT, e.id, e.topic, e.action, e.payload, e.created_at
+  FROM public.change_events e
+  WHERE (e.txid, e.id) > (after_txid::xid8, after_id)
+    AND e.txid < pg_snapshot_xmin(pg_current_snapshot())
+  ORDER BY e.txid, e.id
+  LIMIT page_limit;
+$$;
+
+-- Where a reader starting from the present begins: every transaction
+-- before it has ended
+CREATE OR REPLACE FUNCTION public.change_events_horizon()
+RETURNS TEXT
+LANGUAGE sql STABLE AS $$
+  SELECT pg_snapshot_xmin(pg_current_snapshot())::TEXT;
+$$;
+
+-- ============================================
+-- SEED DATA: Communes (provincial capitals and Bujumbura)
+-- ============================================
+INSERT INTO public.communes (name, latitude, longitude) VALUES
+  ('bujumbura', -3.3822, 29.3644),
+  ('gitega', -3.4271, 29.9246),
+  ('ngozi', -2.9075, 29.8306),
+  ('kayanza', -2.9221, 29.6293),
+  ('rumonge', -3.9736, 29.4386),
+  ('muyinga', -2.8451, 30.3414),
+  ('kirundo', -2.5845, 30.0959),
+  ('makamba', -4.1348, 29.8040),
+  ('bururi', -3.9489, 29.6244),
+  ('cibitoke', -2.8869, 29.1248),
+  ('bubanza', -3.0804, 29.3910),
+  ('muramvya', -3.2682, 29.6079),
+  ('mwaro', -3.5113, 29.7040),
+  ('karuzi', -3.1014, 30.1627),
+  ('cankuzo', -3.2186, 30.5528),
+  ('ruyigi', -3.4764, 30.2488),
+  ('rutana', -3.9279, 29.9920)
+ON CONFLICT (name) DO UPDATE SET latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude;
+
+-- Coordinates of existing users and products
+UPDATE public.users u
+SET latitude = c.latitude, longitude = c.longitude
+FROM public.communes c
+WHERE u.latitude IS NULL AND c.name = lower(trim(u.location));
+
+UPDATE public.products p
+SET latitude = u.latitude, longitude = u.longitude
+FROM public.users u
+WHERE p.latitude IS NULL AND u.id = p.farmer_id AND u.latitude IS NOT NULL;
+
+-- Farmer profile copy of existing products
+UPDATE public.products p
+SET farmer_name = u.username, farmer_phone = u.phone, farmer_location = u.location
+FROM public.users u
+WHERE u.id = p.farmer_id
+  AND (p.farmer_name IS DISTINCT FROM u.username
+       OR p.farmer_phone IS DISTINCT FROM u.phone
+       OR p.farmer_location IS DISTINCT FROM u.location);
 
 -- ============================================
 -- SEED DATA: Sample Market Prices
@@ -0,0 +1,19 @@
+import api from './axios';
+
+export default {
+    getPrices(params) {
+        return api.get('/market-prices', { params });
+    },
+    getSummary(params) {
+        return api.get('/market-prices/summary', { params });
+    },
+    /**
+     * Subscribe to live changes (server-sent events)
+     * @param {string[]} topics - 'market_prices' and/or 'products'
+     * @returns {EventSource} - Reconnects by itself; call close() when done
+     */
+    openStream(topics = ['market_prices']) {
+        const params = new URLSearchParams({ topics: topics.join(',') });
+        return new EventSource(`${api.defaults.baseURL}/stream?${params}`);
+    }
+};
@@ -1,6 +1,15 @@
 import { defineStore } from 'pinia';
 import { supabase } from '../supabase';
 
+// The columns of a listing, as in the backend's LISTING_COLUMNS: not the
+// search_vector and geo columns, which are only used inside the database
+const LISTING_COLUMNS = [
+    'id', 'farmer_id', 'name', 'category', 'price_per_kg',
+    'quantity_available', 'description', 'image_url', 'image_variants',
+    'latitude', 'longitude', 'created_at',
+    'farmer_name', 'farmer_phone', 'farmer_location'
+].join(',');
+
 export const useProductStore = defineStore('products', {
     state: () => ({
         products: [],
@@ -31,10 +40,7 @@ export const useProductStore = defineStore('products', {
             try {
                 let query = supabase
                     .from('products')
-                    .select(`
-                        *,
-                        farmer:users!farmer_id (username, phone, location)
-                    `)
+                    .select(LISTING_COLUMNS)
                     .order('created_at', { ascending: false });
 
                 // Apply filters if provided
@@ -50,13 +56,8 @@ export const useProductStore = defineStore('products', {
 
                 if (error) throw error;
 
-                // Transform data to match expected format
-                this.products = data.map(product => ({
-                    ...product,
-                    farmer_name: product.farmer?.username,
-                    farmer_phone: product.farmer?.phone,
-                    farmer_location: product.farmer?.location
-                }));
+                // farmer_name, farmer_phone and farmer_location are product columns
+                this.products = data;
             } catch (error) {
                 this.error = error.message || 'Failed to fetch products';
             } finally {
@@ -70,21 +71,13 @@ export const useProductStore = defineStore('products', {
             try {
                 const { data, error } = await supabase
                     .from('products')
-                    .select(`
-                        *,
-                        farmer:users!farmer_id (username, phone, location)
-                    `)
+                    .select(LISTING_COLUMNS)
                     .eq('id', id)
                     .single();
 
                 if (error) throw error;
 
-                this.currentProduct = {
-                    ...data,
-                    farmer_name: data.farmer?.username,
-                    farmer_phone: data.farmer?.phone,
-                    farmer_location: data.farmer?.location
-                };
+                this.currentProduct = data;
             } catch (error) {
                 this.error = error.message || 'Failed to fetch product';
             } finally {
@@ -98,7 +91,7 @@ export const useProductStore = defineStore('products', {
             try {
                 const { data, error } = await supabase
                     .from('products')
-                    .select('*')
+                    .select(LISTING_COLUMNS)
                     .eq('farmer_id', farmerId)
                     .order('created_at', { ascending: false });
 